@@ -16,6 +16,8 @@ from wordcloud import WordCloud, STOPWORDS
 from PIL import Image
 import numpy as np
 
+from freqfile import write_frequency_file
+
 class WordCloudApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -414,15 +416,9 @@ class WordCloudApp(QMainWindow):
                 words_dict[w] = words_dict.get(w, 0) + 1
         words_list = sorted(words_dict.items(), key=lambda x: x[1], reverse=True)
 
-        # 6) 写入统计文件到 ./counts 目录，文件名为原文件名+Count.txt
-        if not os.path.exists('./counts'):
-            os.mkdir('./counts')
+        # 6) 写入词频表到 ./counts 目录，文件名为原文件名+.wfq（见 freqfile.py）
         text_basename = os.path.splitext(os.path.basename(self.text_file_path))[0]
-        count_filename = f"{text_basename}Count.txt"
-        count_filepath = os.path.join('./counts', count_filename)
-        with open(count_filepath, 'w', encoding='utf-8') as f_out:
-            for k, v in words_list:
-                f_out.write('{:<8}{:>2}\n'.format(k, v))
+        write_frequency_file(os.path.join('./counts', f"{text_basename}.wfq"), words_dict)
         # 7) 生成词云图
         mask_image = imageio.imread(self.image_path)
         w = WordCloud(
@@ -0,0 +1,136 @@
+#bench.py
+"""生成流程基准测试，使用仓库自带的 texts/ 和 thumbnail/ 数据，不需要 Qt 或数据库
+
+用法:
+    python bench.py                     # 运行并与 bench_baseline.json 比较
+    python bench.py --save              # 运行并把结果保存为新的基准
+    python bench.py --font simhei.ttf   # 指定中文字体（默认使用 set_font 的 SimHei）
+"""
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import tracemalloc
+
+import imageio
+
+from cache import binarize_mask
+from core import WordCloudCore
+
+TEXTS = ['texts/水浒传.txt', 'texts/西游记.txt']
+SCALES = [1, 2, 4, 8]
+
+
+def measure(func, repeat=1):
+    """返回 (结果, 最短耗时秒, 峰值内存字节)
+
+    tracemalloc 会成倍拖慢 Python 代码，计时在关闭 tracemalloc 时进行，
+    峰值内存另外单独运行一次测量。
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    del result  # 不计入下一次运行的峰值
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def run_benchmarks(core, repeat=1):
+    """依次测量各阶段，返回 {阶段名: {'seconds', 'peak_bytes'}}"""
+    results = {}
+
+    def record(name, func):
+        value, seconds, peak = measure(func, repeat)
+        results[name] = {'seconds': round(seconds, 4), 'peak_bytes': peak}
+        print(f"{name:<40} {seconds:>8.3f}s {peak / 1024 / 1024:>8.1f}MB")
+        return value
+
+    words = None
+    for text_path in TEXTS:
+        if not os.path.exists(text_path):
+            print(f"跳过不存在的文本: {text_path}")
+            continue
+        core.text_file_path = text_path
+        name = os.path.basename(text_path)
+        text = record(f'read_text_file[{name}]', core.read_text_file)
+        words = record(f'process_text[{name}]', lambda text=text: core.process_text(text))
+        del text
+
+    mask = None
+    for mask_path in sorted(glob.glob('thumbnail/*.png')):
+        name = os.path.basename(mask_path)
+        mask = record(f'mask_load[{name}]',
+                      lambda: binarize_mask(imageio.imread(mask_path)))
+
+    if words is not None and mask is not None:
+        for scale in SCALES:
+            core.scale = scale
+            record(f'create_wordcloud[scale={scale}]',
+                   lambda: core.create_wordcloud(mask, words).to_image())
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """与基准比较，返回超出容差的阶段列表"""
+    regressions = []
+    for name, current in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            if old[metric] and current[metric] > old[metric] * (1 + tolerance):
+                regressions.append((name, metric, old[metric], current[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='词云生成流程基准测试')
+    parser.add_argument('--baseline', default='bench_baseline.json', help='基准文件路径')
+    parser.add_argument('--save', action='store_true', help='把本次结果保存为基准')
+    parser.add_argument('--repeat', type=int, default=1, help='每个阶段重复次数，取最短耗时')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的退化比例')
+    parser.add_argument('--font', help='字体文件路径')
+    args = parser.parse_args(argv)
+
+    core = WordCloudCore(use_database=False)
+    core.set_font('SimHei')
+    if args.font:
+        core.font_path = args.font
+    elif not os.path.exists(core.font_path):
+        core.font_path = None  # 使用 wordcloud 自带字体，只用于计时
+
+    results = run_benchmarks(core, args.repeat)
+
+    if args.save:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基准已保存到: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"没有找到基准文件 {args.baseline}，使用 --save 创建")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for name, metric, old, new in regressions:
+        print(f"退化: {name} {metric} {old} -> {new}")
+    if not regressions:
+        print("没有发现性能退化")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+#cache.py
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import imageio
+import numpy as np
+from PIL import Image
+
+
+def evict_dir(cache_dir, suffix, max_entries, max_bytes):
+    """按最近使用时间淘汰缓存文件，直到条目数和总大小都在限制内
+
+    返回淘汰后的 (条目数, 总字节数)。
+    """
+    entries = []
+    for fname in os.listdir(cache_dir):
+        if fname.endswith(suffix):
+            path = os.path.join(cache_dir, fname)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    while entries and (len(entries) > max_entries or total > max_bytes):
+        _, size, path = entries.pop(0)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+    return len(entries), total
+
+
+class FrequencyCache:
+    """词频磁盘缓存，按 (文本内容哈希, 停用词哈希, 分词设置) 作为键，LRU + 容量淘汰"""
+
+    def __init__(self, cache_dir='./cache/freq', max_entries=64, max_bytes=256 * 1024 * 1024,
+                 memory_entries=4):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # 最近使用的几项直接留在内存中
+        self._lock = threading.Lock()  # 界面线程和后台任务（生成、上传）共用同一个缓存
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        """分块计算文件内容哈希"""
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    @staticmethod
+    def hash_items(items):
+        """对可排序的字符串集合计算稳定哈希"""
+        h = hashlib.sha1()
+        for item in sorted(items):
+            h.update(item.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    @classmethod
+    def settings_key(cls, stopwords, settings):
+        """停用词和分词设置的哈希，与文本内容无关"""
+        parts = [cls.hash_items(stopwords), json.dumps(settings, sort_keys=True, ensure_ascii=False)]
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def make_key(self, text_path, stopwords, settings):
+        """生成缓存键"""
+        parts = [
+            self.hash_file(text_path),
+            self.hash_items(stopwords),
+            json.dumps(settings, sort_keys=True, ensure_ascii=False),
+        ]
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, key):
+        """读取缓存，未命中返回 None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                words = json.load(f)
+            os.utime(path, None)  # 更新访问时间，供 LRU 淘汰使用
+        except (OSError, ValueError) as e:
+            print(f"读取词频缓存失败: {str(e)}")
+            return None
+        self._remember(key, words)
+        return words
+
+    def put(self, key, words):
+        """写入缓存并按需淘汰旧项"""
+        self._remember(key, words)
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            path = self._entry_path(key)
+            # 多个线程可能同时写入同一个键，临时文件按线程区分
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(words, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            print(f"写入词频缓存失败: {str(e)}")
+
+    def _remember(self, key, words):
+        with self._lock:
+            self._memory[key] = words
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self):
+        evict_dir(self.cache_dir, '.json', self.max_entries, self.max_bytes)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._memory.clear()
+        if os.path.exists(self.cache_dir):
+            for fname in os.listdir(self.cache_dir):
+                if fname.endswith('.json'):
+                    os.remove(os.path.join(self.cache_dir, fname))
+
+
+def binarize_mask(image):
+    """把底图转换为 wordcloud 使用的二值遮罩：255 为不可绘制区域，0 为可绘制区域
+
+    除纯白像素外，带透明通道的图片中完全透明的像素也视为不可绘制。
+    """
+    image = np.asarray(image)
+    if image.ndim == 2:
+        masked = image == 255
+    else:
+        masked = np.all(image[:, :, :3] == 255, axis=-1)
+        if image.shape[2] == 4:
+            masked |= image[:, :, 3] == 0
+    return np.where(masked, 255, 0).astype(np.uint8)
+
+
+class MaskCache:
+    """底图遮罩缓存，按 (路径, 修改时间, 大小) 作为键，以可内存映射的 .npy 保存"""
+
+    def __init__(self, cache_dir='./cache/masks', max_entries=64, max_bytes=512 * 1024 * 1024,
+                 memory_entries=8):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()  # 界面线程和后台生成、批量预处理共用同一个缓存
+
+    @staticmethod
+    def make_key(image_path):
+        st = os.stat(image_path)
+        raw = f'{os.path.abspath(image_path)}|{st.st_mtime_ns}|{st.st_size}'
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npy')
+
+    def load(self, image_path):
+        """读取底图遮罩，未命中时解码并二值化后写入缓存"""
+        key = self.make_key(image_path)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._entry_path(key)
+        mask = None
+        if os.path.exists(path):
+            try:
+                mask = np.load(path, mmap_mode='r')
+                os.utime(path, None)
+            except (OSError, ValueError) as e:
+                print(f"读取遮罩缓存失败: {str(e)}")
+        if mask is None:
+            mask = binarize_mask(imageio.imread(image_path))
+            self._store(path, mask)
+
+        with self._lock:
+            self._memory[key] = mask
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+        return mask
+
+    def _store(self, path, mask):
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, mask)
+            os.replace(tmp_path, path)
+            evict_dir(self.cache_dir, '.npy', self.max_entries, self.max_bytes)
+        except OSError as e:
+            print(f"写入遮罩缓存失败: {str(e)}")
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._memory.clear()
+        if os.path.exists(self.cache_dir):
+            for fname in os.listdir(self.cache_dir):
+                if fname.endswith('.npy'):
+                    os.remove(os.path.join(self.cache_dir, fname))
+
+
+class ThumbnailCache:
+    """缩略图磁盘缓存，按 (路径, 修改时间, 大小) 作为键，保存缩小后的 PNG"""
+
+    def __init__(self, cache_dir='./cache/thumbs', size=(180, 120), max_entries=4096,
+                 max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # 缓存目录的条目数和总字节数，第一次写入时扫描一次，之后随写入累加
+        self._entries = None
+        self._bytes = 0
+        self._lock = threading.Lock()  # 多个加载线程同时写入
+
+    def make_key(self, image_path):
+        return f'{MaskCache.make_key(image_path)}_{self.size[0]}x{self.size[1]}'
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.png')
+
+    def load(self, image_path):
+        """返回缩略图文件路径，未命中时解码原图、缩小后写入缓存"""
+        path = self._entry_path(self.make_key(image_path))
+        if os.path.exists(path):
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            return path
+
+        with Image.open(image_path) as image:
+            image.draft('RGB', self.size)  # JPEG 可以直接按较小尺寸解码
+            image.thumbnail(self.size)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            image.save(tmp_path, format='PNG')
+        os.replace(tmp_path, path)
+        self._added(os.path.getsize(path))
+        return path
+
+    def _added(self, size):
+        """记录新写入的缩略图，超过上限时才扫描目录淘汰"""
+        with self._lock:
+            if self._entries is None:
+                self._entries, self._bytes = evict_dir(self.cache_dir, '.png',
+                                                       self.max_entries, self.max_bytes)
+                return
+            self._entries += 1
+            self._bytes += size
+            if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+                return
+            # 淘汰到上限的 90%，之后可以再写入一批才需要再次扫描
+            self._entries, self._bytes = evict_dir(self.cache_dir, '.png',
+                                                   self.max_entries * 9 // 10,
+                                                   self.max_bytes * 9 // 10)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries = None
+        if os.path.exists(self.cache_dir):
+            for fname in os.listdir(self.cache_dir):
+                if fname.endswith('.png'):
+                    os.remove(os.path.join(self.cache_dir, fname))
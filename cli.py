@@ -0,0 +1,192 @@
+#cli.py
+"""命令行批量生成词云
+
+用法:
+    python cli.py jobs.json [--workers N] [--segment-workers N] [--report report.json]
+                            [--corpus texts] [--trace-memory]
+
+任务清单为 JSON，可以是任务列表，也可以是 {"jobs": [...]}。每个任务:
+    {
+        "text": "texts/水浒传.txt",          # text、frequencies、text_id 三选一
+        "frequencies": "counts/水浒传.wfq",  # 直接使用导出的词频文件，不再分词
+        "text_id": 12,                       # 数据库中的文本 ID，优先使用预先统计的词频
+        "mask": "thumbnail/China.png",       # 必填
+        "output": "export/shuihu.png",       # 必填，格式由扩展名决定
+        "font": "SimHei",                    # 字体名或 .ttf 路径
+        "base_color": "#000000",
+        "similar_colors": [], "contrast_colors": [],
+        "bg_color": "#ffffff",
+        "scale": 4,
+        "weighting": "tfidf"                 # 按语料库 TF-IDF 加权，默认 "count" 按词频
+    }
+相对路径以当前工作目录为准。--corpus 指定的目录会在生成前增量更新语料索引
+（./cache/corpus），未指定时 TF-IDF 任务使用已有的索引。--trace-memory 统计每个
+任务的峰值内存（peak_bytes，写入报告），会使生成变慢。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core import WordCloudCore
+from segment import resolve_workers
+
+
+def load_manifest(path):
+    """读取任务清单"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    jobs = data.get('jobs', []) if isinstance(data, dict) else data
+    for i, job in enumerate(jobs):
+        missing = [k for k in ('mask', 'output') if not job.get(k)]
+        if not job.get('text') and not job.get('frequencies') and job.get('text_id') is None:
+            missing.insert(0, 'text')
+        if missing:
+            raise ValueError(f"第 {i + 1} 个任务缺少字段: {', '.join(missing)}")
+    return jobs
+
+
+def build_core(job):
+    """按任务参数创建 WordCloudCore，只有使用数据库文本的任务才连接数据库"""
+    core = WordCloudCore(use_database=job.get('text_id') is not None)
+    core.text_file_path = job.get('text', '')
+    core.text_id = job.get('text_id')
+    core.frequency_path = job.get('frequencies')
+    core.image_path = job['mask']
+    font = job.get('font', 'SimHei')
+    if os.path.isfile(font):
+        core.font_path = font
+    else:
+        core.set_font(font)
+    core.set_colors(job.get('base_color', '#000000'),
+                    list(job.get('similar_colors', [])),
+                    list(job.get('contrast_colors', [])),
+                    job.get('bg_color', '#ffffff'))
+    core.scale = int(job.get('scale', 4))
+    core.weighting = job.get('weighting', 'count')
+    return core
+
+
+def prepare_text(text_path, segment_workers=1):
+    """分词并写入词频缓存，同一文本只处理一次；长文本按 segment_workers 个进程并行分词"""
+    core = WordCloudCore(use_database=False)
+    core.text_file_path = text_path
+    core.workers = segment_workers
+    start = time.perf_counter()
+    core.get_frequencies()
+    return text_path, time.perf_counter() - start
+
+
+def prepare_mask(mask_path):
+    """解码底图并写入遮罩缓存，同一底图只处理一次"""
+    core = WordCloudCore(use_database=False)
+    start = time.perf_counter()
+    core.mask_cache.load(mask_path)
+    return mask_path, time.perf_counter() - start
+
+
+def run_job(index, job, trace_memory=False):
+    """执行单个任务，异常不向外抛出"""
+    start = time.perf_counter()
+    core = None
+    try:
+        core = build_core(job)
+        core.trace_memory = trace_memory
+        success, message = core.generate_wordcloud()
+        if success:
+            out_dir = os.path.dirname(job['output'])
+            if out_dir and not os.path.exists(out_dir):
+                os.makedirs(out_dir)
+            success, message = core.save_image(job['output'])
+    except Exception as e:
+        success, message = False, f"生成失败: {str(e)}"
+    return {
+        'index': index,
+        'output': job['output'],
+        'success': success,
+        'message': message,
+        'seconds': round(time.perf_counter() - start, 3),
+        'stages': core.last_stats['stages'] if core and core.last_stats else {},
+        'peak_bytes': core.last_stats['peak_bytes'] if core and core.last_stats else None,
+    }
+
+
+def run_batch(jobs, workers=None, segment_workers=None, trace_memory=False):
+    """先并行预处理去重后的文本和底图，再并行执行全部任务
+
+    segment_workers 为每个文本分词的进程数，None 时把 CPU 核心平均分给需要分词的文本。
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        texts = sorted({job['text'] for job in jobs
+                        if job.get('text') and not job.get('frequencies')
+                        and job.get('text_id') is None})
+        masks = sorted({job['mask'] for job in jobs})
+        if segment_workers is None:
+            segment_workers = max(1, resolve_workers(workers) // max(1, len(texts)))
+        prep = [pool.submit(prepare_text, t, segment_workers) for t in texts]
+        prep += [pool.submit(prepare_mask, m) for m in masks]
+        for future in as_completed(prep):
+            try:
+                path, seconds = future.result()
+                print(f"预处理 {path}: {seconds:.2f}s")
+            except Exception as e:
+                # 预处理失败不中断，对应任务会在执行时报告错误
+                print(f"预处理失败: {str(e)}")
+
+        futures = {pool.submit(run_job, i, job, trace_memory): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'index': i, 'output': jobs[i]['output'], 'success': False,
+                          'message': f"任务进程异常: {str(e)}", 'seconds': None}
+            status = '成功' if result['success'] else '失败'
+            print(f"[{i + 1}/{len(jobs)}] {status} {result['output']} "
+                  f"({result['seconds']}s) {'' if result['success'] else result['message']}")
+            results.append(result)
+    results.sort(key=lambda r: r['index'])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量生成词云')
+    parser.add_argument('manifest', help='任务清单 JSON 文件')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认为 CPU 核心数')
+    parser.add_argument('--segment-workers', type=int, default=None,
+                        help='每个文本分词的进程数，0 为全部核心，默认把核心平均分给各文本')
+    parser.add_argument('--report', help='把每个任务的耗时和结果写入 JSON 文件')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='统计每个任务的峰值内存（会使生成变慢）')
+    parser.add_argument('--corpus', help='生成前增量更新该目录文本的语料索引，供 TF-IDF 加权使用')
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"读取任务清单失败: {str(e)}")
+        return 2
+
+    start = time.perf_counter()
+    if args.corpus:
+        core = WordCloudCore(use_database=False)
+        core.corpus_workers = args.workers or 0
+        _, message = core.update_corpus(args.corpus)
+        print(f"{message}，用时 {time.perf_counter() - start:.2f}s")
+    segment_workers = None if args.segment_workers is None else resolve_workers(args.segment_workers)
+    results = run_batch(jobs, args.workers, segment_workers, args.trace_memory)
+    failed = [r for r in results if not r['success']]
+    print(f"完成 {len(results) - len(failed)}/{len(results)} 个任务，"
+          f"总耗时 {time.perf_counter() - start:.2f}s")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,112 +1,132 @@
 #core.py
 import os
+import copy
+import time
 import jieba
-import imageio
 from wordcloud import WordCloud
 import random
-import pyodbc
+from contextlib import nullcontext
 from datetime import datetime
+from cache import FrequencyCache, MaskCache
+from corpus import CorpusIndex
+from stats import GenerationStats
+from freqfile import export_csv, read_frequency_file, write_frequency_file
+from storage import create_store, file_hash
+from segment import (PUNCTUATION, IncrementalCounter, align_chunks, count_tokens,
+                     count_token_stream, iter_text_chunks, normalize_chunks, normalize_text,
+                     resolve_workers, universal_newline_chunks)
+
+# 词云最多显示的词数
+MAX_WORDS = 1000
+# 渐进预览时草图使用的最大词数
+DRAFT_MAX_WORDS = 200
+
+
+def file_stamp(path):
+    """文件的 (修改时间, 大小)，不存在时为 None；原地编辑文件后生成参数随之变化"""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
 
 class WordCloudCore:
-    def __init__(self):
+    def __init__(self, use_database=True, store=None):
         self.image_path = ''
         self.font_path = ''
         self.text_file_path = ''
+        self.text_id = None  # 数据库中的文本 ID，设置后直接读取预先统计的词频
+        self.frequency_path = None  # .wfq 词频文件，设置后直接读取，不再分词
+        self.watch_text = False  # 跟踪不断追加的文本，只对新增部分分词
+        self.text_watchers = {}  # 绝对路径 -> IncrementalCounter，快照之间共享
+        self.text_revision = 0  # 文本内容变化时递增，使相同参数也会重新生成
+        self.weighting = 'count'  # 'count' 按词频，'tfidf' 按语料库 TF-IDF 加权
+        self.corpus = CorpusIndex()  # 语料库文档频率索引，快照之间共享
         self.base_color = '#000000'
         self.similar_colors = []
         self.contrast_colors = []
         self.bg_color = '#ffffff'
         self.scale = 4  # 默认scale值
+        self.freq_cache = FrequencyCache()  # 词频缓存，避免重复分词
+        self.mask_cache = MaskCache()  # 底图遮罩缓存，避免重复解码
+        self.workers = resolve_workers(0)  # 分词进程数，默认使用全部 CPU 核心；短文本总是单进程
+        self.corpus_workers = 0  # 建立语料索引时并行分词的文档数，0 表示使用全部 CPU 核心
+        self.progressive = True  # scale 较大时先生成低分辨率草图
+        self.wordcloud = None  # 最近一次生成的词云，保留布局用于仅改颜色
+        self.image = None  # 最近一次渲染结果（PIL Image），导出时才编码
+        self._layout_key = None
 
-        # 初始化数据库连接
-        self.conn = self._init_database()
-        self._create_tables()
-
-    def _init_database(self):
-        """初始化数据库连接"""  #需要填写自己的数据库连接信息
-        connection_string = (
-            'DRIVER={ODBC Driver 17 for SQL Server};'
-            'SERVER=.;'
-            'DATABASE=WordCloudDB;'
-            'UID=sa;'
-            'PWD=PASSWORD;'
-            'Charset=UTF8;'
-        )
-        return pyodbc.connect(connection_string)
-
-    def _create_tables(self):
-        """创建数据库表"""
-        cursor = self.conn.cursor()
-
-        # 检查表是否存在
-        cursor.execute("""
-        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='WordCloudData' AND xtype='U')
-        CREATE TABLE WordCloudData (
-            ID INT PRIMARY KEY IDENTITY(1,1),
-            ImageName NVARCHAR(255) NULL,
-            ImageData VARBINARY(MAX) NULL,
-            TextFileName NVARCHAR(255) NULL,
-            TextData NVARCHAR(MAX) NULL,
-            CreatedDate DATETIME DEFAULT GETDATE()
-        )
-        """)
-        self.conn.commit()
+        # 性能统计
+        self.stats_hooks = []  # 每次生成结束后以统计信息 dict 回调，在生成线程中调用
+        self.trace_memory = False  # 记录峰值内存（tracemalloc 会拖慢生成）
+        self.profile = False  # 用 cProfile 记录调用耗时
+        self.last_stats = None
+        self._stats = None
 
-    # 数据库操作方法
-    def add_to_database(self, image_path=None, text_path=None):
-        """通用添加方法，可单独或同时添加图片和文本"""
-        if image_path and not os.path.exists(image_path):
-            return False, f"图片文件不存在: {image_path}"
-        if text_path and not os.path.exists(text_path):
-            return False, f"文本文件不存在: {text_path}"
+        # 数据库在后台连接，启动不等待；命令行批量生成等场景不需要数据库
+        self.store = None
+        if use_database:
+            self.store = store or create_store()
+            self.store.connect_async()
 
-        try:
-            cursor = self.conn.cursor()
-            params = {}
+    # 语料库操作方法
+    def update_corpus(self, directory='./texts', progress=None):
+        """增量更新语料索引：目录中的文本，以及已连接的数据库中的文本
 
-            if image_path:
-                with open(image_path, 'rb') as f:
-                    params['ImageName'] = os.path.basename(image_path)
-                    params['ImageData'] = f.read()
+        progress 见 CorpusIndex.update_directory；数据库未连接时只更新目录，不等待连接。
+        """
+        stopwords = self.load_stopwords()
+        settings = self.tokenizer_settings()
+        changed, removed = self.corpus.update_directory(
+            directory, stopwords, settings, self.corpus_workers, progress)
+        if self.store is not None and self.store.is_ready():
+            db_changed, db_removed = self.corpus.update_database(
+                self.store, stopwords, settings, self.corpus_workers, progress)
+            changed += db_changed
+            removed += db_removed
+        return True, f"语料索引已更新: 新增或更新 {changed} 篇，移除 {removed} 篇，共 {len(self.corpus)} 篇"
 
-            if text_path:
-                with open(text_path, 'r', encoding='utf-8') as f:
-                    params['TextFileName'] = os.path.basename(text_path)
-                    params['TextData'] = f.read()
+    # 数据库操作方法
+    def add_to_database(self, image_path=None, text_path=None, progress=None):
+        """通用添加方法，可单独或同时添加图片和文本
 
-            columns = ', '.join(params.keys())
-            values = ', '.join(['?'] * len(params))
+        progress(已上传字节数, 总字节数) 见 WordCloudStore.add_to_database。
+        """
+        if self.store is None:
+            return False, "未启用数据库"
+        frequencies = None
+        if text_path and os.path.exists(text_path):
+            # 存储层查重之后才调用，重复的文本不会被分词；此时数据库中必然没有该文本
+            frequencies = lambda: self.compute_frequencies(text_path, use_database=False)
+        return self.store.add_to_database(image_path, text_path, frequencies, progress,
+                                          self.frequency_settings())
 
-            cursor.execute(f"INSERT INTO WordCloudData ({columns}) VALUES ({values})",
-                           tuple(params.values()))
-            self.conn.commit()
+    def import_directory(self, directory, batch_size=100, progress=None):
+        """把目录中的图片和文本批量导入数据库"""
+        if self.store is None:
+            return False, "未启用数据库"
+        return self.store.import_directory(directory, batch_size, progress)
 
-            return True, "文件已成功添加到数据库"
-        except Exception as e:
-            return False, f"添加失败: {str(e)}"
+    def list_database(self, kind, after_id=0, limit=100):
+        """分页列出数据库中的图片（kind='image'）或文本（kind='text'）元数据"""
+        if self.store is None:
+            return []
+        return self.store.list_items(kind, after_id, limit)
 
+    def fetch_from_database(self, item_id, kind):
+        """按需读取数据库中单个图片或文本的内容"""
+        if self.store is None:
+            return None
+        return self.store.fetch_blob(item_id, kind)
 
     def delete_from_database(self, image_name=None, text_name=None):
         """从数据库删除图片或文本"""
-        try:
-            cursor = self.conn.cursor()
-            if image_name and text_name:
-                cursor.execute("DELETE FROM WordCloudData WHERE ImageName=? AND TextFileName=?",
-                               (image_name, text_name))
-            elif image_name:
-                cursor.execute("DELETE FROM WordCloudData WHERE ImageName=?", (image_name,))
-            elif text_name:
-                cursor.execute("DELETE FROM WordCloudData WHERE TextFileName=?", (text_name,))
-            else:
-                return False, "必须提供图片名或文本名"
-            self.conn.commit()
-            return cursor.rowcount > 0, "删除成功"
-        except Exception as e:
-            self.conn.rollback()
-            return False, f"数据库操作失败: {str(e)}"
-
-
+        if self.store is None:
+            return False, "未启用数据库"
+        return self.store.delete_from_database(image_name, text_name)
 
     def set_colors(self, base, similar, contrast, bg):
         self.base_color = base
@@ -123,31 +143,270 @@ class WordCloudCore:
         font_file = font_map.get(font_name, 'simhei.ttf')
         self.font_path = os.path.join('C:/Windows/Fonts', font_file)
 
-    def generate_wordcloud(self):
-        if not all([self.image_path, self.text_file_path]):
+    def generate_wordcloud(self, on_draft=None):
+        """生成词云，结果保存在 self.image
+
+        提供 on_draft 且开启渐进模式时，先生成 scale=1 的草图并以图像回调。
+        """
+        if not self.image_path or not (self.text_file_path or self.text_id is not None
+                                       or self.frequency_path):
             return False, "请先选择底图和文本文件"
 
+        self._stats = GenerationStats(self.trace_memory, self.profile)
+        self._stats.start()
         try:
-            text = self.read_text_file()
-            words = self.process_text(text)
-            mask = imageio.imread(self.image_path)
-            wordcloud = self.create_wordcloud(mask, words)
-            wordcloud.to_file('./wordcloud.png')
+            words = self.get_frequencies()
+            if self.weighting == 'tfidf':
+                with self.stage('tfidf'):
+                    words = self.weigh_frequencies(words)
+            with self.stage('mask'):
+                mask = self.mask_cache.load(self.image_path)
+            self._stats.data['mask_shape'] = tuple(mask.shape)
+            if on_draft and self.progressive and self.scale > 1:
+                with self.stage('draft'):
+                    draft = self.create_wordcloud(mask, words, scale=1, max_words=DRAFT_MAX_WORDS)
+                    draft_image = draft.to_image()
+                on_draft(draft_image)
+            with self.stage('layout'):
+                wordcloud = self.create_wordcloud(mask, words)
+            with self.stage('render'):
+                self.image = wordcloud.to_image()
+            self.wordcloud = wordcloud
+            self._layout_key = self.layout_key()
             return True, "生成成功"
         except Exception as e:
             return False, f"生成失败: {str(e)}"
+        finally:
+            self._finish_stats()
+
+    def stage(self, name):
+        """统计某个阶段耗时，不在生成过程中时不做任何事"""
+        return self._stats.stage(name) if self._stats else nullcontext()
+
+    def add_stats_hook(self, hook):
+        """注册统计回调 hook(stats)"""
+        self.stats_hooks.append(hook)
+
+    def _finish_stats(self):
+        self.last_stats = self._stats.stop()
+        self._stats = None
+        for hook in self.stats_hooks:
+            try:
+                hook(self.last_stats)
+            except Exception as e:
+                print(f"统计回调出错: {str(e)}")
+
+    def snapshot(self):
+        """复制当前参数，供后台线程生成，避免与界面线程共享可变状态"""
+        job = copy.copy(self)
+        job.similar_colors = list(self.similar_colors)
+        job.contrast_colors = list(self.contrast_colors)
+        return job
+
+    def params_key(self):
+        """完整的生成参数，相同参数无需重复生成"""
+        return self.layout_key() + (self.base_color, tuple(self.similar_colors),
+                                    tuple(self.contrast_colors), self.bg_color)
+
+    def adopt(self, job):
+        """接收后台任务的生成结果"""
+        self.wordcloud = job.wordcloud
+        self.image = job.image
+        self.last_stats = job.last_stats
+        self._layout_key = job._layout_key
+
+    def layout_key(self):
+        """影响词云布局的参数，颜色和背景不在其中
+
+        文本、词频文件、底图和停用词文件带上修改时间和大小，原地编辑后不会被当作已生成。
+        """
+        weighting = (self.weighting, self.corpus.revision) if self.weighting == 'tfidf' else None
+        return (self.text_file_path, file_stamp(self.text_file_path), self.text_id,
+                self.frequency_path, file_stamp(self.frequency_path), self.text_revision,
+                weighting, self.image_path, file_stamp(self.image_path),
+                file_stamp('stopwords.txt'), self.font_path, self.scale)
+
+    def can_recolor(self):
+        """已有布局是否仍然适用于当前参数"""
+        return self.wordcloud is not None and self._layout_key == self.layout_key()
+
+    def recolor_wordcloud(self):
+        """只修改颜色或背景时复用已有布局重新着色，布局已失效则完整生成"""
+        if not self.can_recolor():
+            return self.generate_wordcloud()
+
+        self._stats = GenerationStats(self.trace_memory, self.profile)
+        self._stats.start()
+        try:
+            self.wordcloud.background_color = self.bg_color
+            with self.stage('recolor'):
+                self.wordcloud.recolor(color_func=self.get_color_func())
+            with self.stage('render'):
+                self.image = self.wordcloud.to_image()
+            return True, "着色成功"
+        except Exception as e:
+            return False, f"着色失败: {str(e)}"
+        finally:
+            self._finish_stats()
 
-    def create_wordcloud(self, mask, words):
+    def save_image(self, path):
+        """把最近一次渲染结果编码保存到文件，格式由扩展名决定"""
+        if self.image is None:
+            return False, "没有可以保存的词云图"
+        try:
+            start = time.perf_counter()
+            self.image.save(path)
+            if self.last_stats is not None:
+                self.last_stats['stages']['encode'] = time.perf_counter() - start
+            return True, f"文件已保存到: {path}"
+        except Exception as e:
+            return False, f"保存失败: {str(e)}"
+
+    def create_wordcloud(self, mask, words, scale=None, max_words=MAX_WORDS):
         color_func = self.get_color_func()
         return WordCloud(
             font_path=self.font_path,
             background_color=self.bg_color,
-            scale=self.scale,  # 使用scale参数
-            max_words=1000,
+            scale=scale or self.scale,  # 使用scale参数
+            max_words=max_words,
             mask=mask,
             color_func=color_func
         ).generate_from_frequencies(words)
 
+    def tokenizer_settings(self):
+        """影响分词结果的设置，作为缓存键的一部分"""
+        return {
+            'jieba': getattr(jieba, '__version__', ''),
+            'cut_all': False,
+            'HMM': True,
+            'min_len': 2,
+            'punctuation': ''.join(PUNCTUATION),
+        }
+
+    def frequency_settings(self):
+        """当前停用词和分词设置的哈希，与数据库中的词频一起保存"""
+        return FrequencyCache.settings_key(self.load_stopwords(), self.tokenizer_settings())
+
+    def get_frequencies(self):
+        """获取当前文本的词频
+
+        设置了 frequency_path 时从词频文件读取前 MAX_WORDS 个词；
+        设置了 text_id 时从数据库读取预先统计的前 MAX_WORDS 个词，没有预先统计
+        （如批量导入的文本）或统计时的停用词、分词设置与现在不同，则把数据库中的
+        文本流式送入分词；
+        watch_text 为 True 时只对 text_file_path 上次之后追加的内容分词；
+        否则对 text_file_path 分词（优先读取缓存）。
+        """
+        if self.frequency_path:
+            with self.stage('freq_file'):
+                words = read_frequency_file(self.frequency_path, MAX_WORDS)
+            if self._stats:
+                self._stats.data['words'] = len(words)
+            return words
+        if self.text_id is not None and self.store is not None:
+            with self.stage('db_frequencies'):
+                # 设置相同说明写入前已按同样的停用词过滤，数据库取前 N 个即是过滤后的前 N 个
+                words = self.store.get_top_frequencies(self.text_id, MAX_WORDS,
+                                                       self.frequency_settings())
+            if not words:
+                chunks = universal_newline_chunks(self.store.iter_blob(self.text_id, 'text'))
+                words = self.process_stream(align_chunks(chunks))
+            if self._stats:
+                self._stats.data['words'] = len(words)
+            return words
+        if self.watch_text and os.path.exists(self.text_file_path):
+            return self.incremental_frequencies(self.text_file_path)
+        return self.compute_frequencies(self.text_file_path)
+
+    def weigh_frequencies(self, words):
+        """按语料库 TF-IDF 重新计算当前文本的词权重
+
+        当前文本已收录在索引中时按索引计算，否则视为语料库中再加入一篇文档。
+        """
+        self.corpus.load()
+        if self.text_id is not None:
+            key = f'db:{self.text_id}'
+            doc_key = key if key in self.corpus.docs else None
+        elif self.frequency_path:
+            doc_key = None
+        else:
+            doc_key = self.corpus.find_file(self.text_file_path)
+        return self.corpus.weigh(words, doc_key)
+
+    def incremental_frequencies(self, text_path):
+        """累加统计不断追加的文本，每次只分词新增的完整行"""
+        key = os.path.abspath(text_path)
+        counter = self.text_watchers.get(key)
+        if counter is None:
+            counter = self.text_watchers.setdefault(key, IncrementalCounter(text_path, self.workers))
+        with self.stage('segment'):
+            counter.update()
+            counts = counter.counts()
+        return self.filter_counts(counts)
+
+    def compute_frequencies(self, text_path, use_database=True):
+        """对文本文件分词统计词频
+
+        依次尝试本地缓存、数据库中内容相同的文本预先统计的词频（use_database 为 True 时），
+        都没有时才分词。
+        """
+        if not os.path.exists(text_path):
+            print(f"文件不存在: {text_path}")
+            return {}
+        with self.stage('cache_lookup'):
+            key = self.freq_cache.make_key(text_path, self.load_stopwords(),
+                                           self.tokenizer_settings())
+            words = self.freq_cache.get(key)
+        if self._stats:
+            self._stats.data['frequency_cache'] = 'miss' if words is None else 'hit'
+            self._stats.data['words'] = None if words is None else len(words)
+        if words is None:
+            if use_database:
+                words = self.database_frequencies(text_path)
+            if words is None:
+                words = self.process_stream(iter_text_chunks(text_path))
+            self.freq_cache.put(key, words)
+        return words
+
+    def database_frequencies(self, text_path):
+        """数据库中已有内容相同的文本时读取其完整词频表，没有则返回 None
+
+        只使用按当前停用词和分词设置统计的词频；数据库未连接时不等待连接，直接返回 None。
+        """
+        if self.store is None or not self.store.is_ready():
+            return None
+        try:
+            with self.stage('db_frequencies'):
+                text_id = self.store.find_text_by_hash(file_hash(text_path))
+                if text_id is None:
+                    return None
+                words = self.store.get_top_frequencies(text_id, None, self.frequency_settings())
+        except Exception as e:
+            print(f"读取数据库词频失败: {str(e)}")
+            return None
+        if not words:
+            return None  # 批量导入的文本没有预先统计词频，或统计时的设置与现在不同
+        if self._stats:
+            self._stats.data['words'] = len(words)
+        return words
+
+    def export_frequencies(self, path):
+        """导出当前文本的完整词频表，.csv 导出为 CSV，其他扩展名写成 .wfq 二进制格式"""
+        try:
+            if self.frequency_path:
+                words = read_frequency_file(self.frequency_path)
+            else:
+                words = self.get_frequencies()
+            if not words:
+                return False, "没有可以导出的词频"
+            if path.lower().endswith('.csv'):
+                export_csv(words, path)
+            else:
+                write_frequency_file(path, words)
+            return True, f"词频已导出到: {path}"
+        except Exception as e:
+            return False, f"导出词频失败: {str(e)}"
+
     def read_text_file(self):
         if os.path.exists(self.text_file_path):
             with open(self.text_file_path, 'r', encoding='utf-8') as f:
@@ -157,13 +416,27 @@ class WordCloudCore:
             return ""
 
     def process_text(self, text):
-        rp_str = ['，', '。', '！', '？', '、', '：', '；', '（', '）', '《', '》',
-                  '“', '”', '‘', '’', '【', '】', '—', '…', '·', '～', ' ']
-        for char in rp_str:
-            text = text.replace(char, '')
-        words = jieba.lcut(text)
-        stopwords = self.load_stopwords()
-        return {w: cnt for w, cnt in self.count_words(words) if w not in stopwords and len(w) > 1}
+        with self.stage('segment'):
+            counter = count_tokens(normalize_text(text), self.workers)
+        return self.filter_counts(counter)
+
+    def process_stream(self, chunks):
+        """流式处理文本段：去标点 -> 分词 -> 增量计数，不持有全文"""
+        with self.stage('segment'):
+            counter = count_token_stream(normalize_chunks(chunks), self.workers)
+        return self.filter_counts(counter)
+
+    def filter_counts(self, counter):
+        """按词频排序并去除停用词和单字"""
+        with self.stage('filter'):
+            stopwords = self.load_stopwords()
+            words = {w: cnt for w, cnt in counter.most_common()
+                     if w not in stopwords and len(w) > 1}
+        if self._stats:
+            self._stats.data['tokens'] = sum(counter.values())
+            self._stats.data['unique_words'] = len(counter)
+            self._stats.data['words'] = len(words)
+        return words
 
     def count_words(self, words):
         from collections import Counter
@@ -0,0 +1,387 @@
+#corpus.py
+"""语料库文档频率索引与 TF-IDF 加权
+
+对 texts/（或数据库）中的每篇文本分词（map），合并出“每个词出现在多少篇
+文本中”的文档频率表（reduce）。索引保存在 index_dir 下:
+    index.json      各文档的签名（路径、大小、修改时间、内容哈希）及统计设置
+    df.wfq          文档频率表，格式见 freqfile
+    docs/<哈希>.wfq 每篇文档过滤后的词频，移除或修改文档时据此从文档频率中减去
+
+更新时只对新增和内容变化的文档分词，其余文档直接沿用；一次更新中的变化
+累积后一次性并入文档频率表。内容哈希与数据库的 TextHash 相同，texts/ 中的
+文件和数据库中内容相同的文本只算一篇。
+"""
+import os
+import json
+import math
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import jieba
+
+from cache import FrequencyCache
+from freqfile import FrequencyFile, write_frequency_file
+from storage import file_hash
+from segment import (align_chunks, count_token_stream, iter_text_chunks, normalize_chunks,
+                     resolve_workers, universal_newline_chunks)
+
+INDEX_VERSION = 2
+
+_stopwords = frozenset()
+
+
+def _init_worker(stopwords):
+    global _stopwords
+    _stopwords = stopwords
+    jieba.initialize()
+
+
+def filter_terms(counter, stopwords):
+    """与 WordCloudCore.filter_counts 相同的过滤：去除停用词和单字"""
+    return {w: cnt for w, cnt in counter.items() if w not in stopwords and len(w) > 1}
+
+
+def count_document(path, workers=1):
+    """对一篇文本分词并过滤（可在子进程中运行）"""
+    counter = count_token_stream(normalize_chunks(iter_text_chunks(path)), workers)
+    return filter_terms(counter, _stopwords)
+
+
+def inverse_document_frequency(df, docs):
+    """平滑的 IDF：log((1 + 文档数) / (1 + 文档频率))，出现在所有文档中的词为 0"""
+    return math.log((1 + docs) / (1 + df))
+
+
+class _Batch:
+    """一次更新中累积的变化，结束时一次性并入索引"""
+
+    def __init__(self, docs):
+        self.docs = dict(docs)    # 更新后的 文档键 -> 签名
+        self.refs = Counter(doc['hash'] for doc in docs.values())  # 内容哈希 -> 引用的文档数
+        self.delta = Counter()    # 文档频率的增减
+        self.released = set()     # 可能已不再被引用的内容哈希
+
+
+class CorpusIndex:
+    """持久化的文档频率索引，界面线程和后台任务可以同时使用"""
+
+    def __init__(self, index_dir='./cache/corpus'):
+        self.index_dir = index_dir
+        self.docs = {}       # 文档键 -> 签名 dict
+        self.df = Counter()  # 词 -> 包含该词的文档数（内容相同的文档只算一次）
+        self.contents = 0    # 不同内容的文档数
+        self.settings = None
+        self.revision = 0    # 索引内容变化时递增，作为生成参数的一部分
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()  # 同一时间只允许一个更新任务
+        self._loaded = False
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.index_dir, 'index.json')
+
+    @property
+    def _df_path(self):
+        return os.path.join(self.index_dir, 'df.wfq')
+
+    def _doc_path(self, digest):
+        return os.path.join(self.index_dir, 'docs', f'{digest}.wfq')
+
+    @staticmethod
+    def settings_key(stopwords, settings):
+        """停用词和分词设置变化后，已有的索引全部作废"""
+        return FrequencyCache.settings_key(stopwords, settings)
+
+    def load(self):
+        """读取磁盘上的索引，只在第一次调用时读取"""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not os.path.exists(self._index_path):
+                return
+            try:
+                with open(self._index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') != INDEX_VERSION:
+                    return
+                with FrequencyFile(self._df_path) as table:
+                    df = Counter(dict(table.words()))
+            except (OSError, ValueError) as e:
+                print(f"读取语料索引失败: {str(e)}")
+                return
+            self.docs = data.get('docs', {})
+            self.contents = len({doc['hash'] for doc in self.docs.values()})
+            self.settings = data.get('settings')
+            self.df = df
+
+    def save(self):
+        """把索引写回磁盘，先写 df.wfq 再替换 index.json"""
+        with self._lock:
+            data = {'version': INDEX_VERSION, 'settings': self.settings, 'docs': self.docs}
+            df = self.df
+        if not os.path.exists(self.index_dir):
+            os.makedirs(self.index_dir)
+        write_frequency_file(self._df_path, df)
+        tmp_path = f'{self._index_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self._index_path)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _reset(self, settings):
+        """清空索引，按旧设置统计的文档词频不能再复用"""
+        with self._lock:
+            self.docs = {}
+            self.df = Counter()
+            self.contents = 0
+            self.settings = settings
+            self.revision += 1
+        docs_dir = os.path.join(self.index_dir, 'docs')
+        if os.path.exists(docs_dir):
+            for fname in os.listdir(docs_dir):
+                if fname.endswith('.wfq'):
+                    os.remove(os.path.join(docs_dir, fname))
+
+    def _add(self, batch, key, terms, signature):
+        """把一篇文档的词记入本次更新（reduce），同键的旧文档先被移除
+
+        内容已被其他文档引用时 terms 不会被使用，可以传入空 dict。
+        """
+        digest = signature['hash']
+        doc_path = self._doc_path(digest)
+        if not os.path.exists(doc_path):
+            write_frequency_file(doc_path, terms)
+        if key in batch.docs:
+            self._drop(batch, key)
+        batch.docs[key] = signature
+        batch.refs[digest] += 1
+        if batch.refs[digest] == 1:
+            batch.delta.update(terms.keys())
+
+    def _drop(self, batch, key):
+        """从本次更新中移除一篇文档，内容不再被其他文档引用时才从文档频率中减去"""
+        old = batch.docs.pop(key)
+        digest = old['hash']
+        batch.refs[digest] -= 1
+        if batch.refs[digest] <= 0:
+            del batch.refs[digest]
+            batch.delta.subtract(self._doc_terms(old).keys())
+            batch.released.add(digest)
+
+    def _commit(self, batch):
+        """把一次更新并入索引：df 只复制一次，在锁内整体替换"""
+        with self._lock:
+            if batch.delta or batch.docs != self.docs:
+                # 复制后再修改，正在读取 df 的生成线程不受影响
+                df = Counter(self.df)
+                df.update(batch.delta)
+                self.df = +df
+                self.revision += 1
+            self.docs = batch.docs
+            self.contents = len(batch.refs)
+        for digest in batch.released:
+            if digest not in batch.refs:
+                try:
+                    os.remove(self._doc_path(digest))
+                except OSError:
+                    pass
+
+    def _doc_terms(self, signature):
+        try:
+            with FrequencyFile(self._doc_path(signature['hash'])) as table:
+                return dict(table.words())
+        except (OSError, ValueError) as e:
+            print(f"读取文档词频失败: {str(e)}")
+            return {}
+
+    def find_file(self, path):
+        """文件已按当前内容收录时返回其文档键，否则返回 None"""
+        key = os.path.abspath(path)
+        doc = self.docs.get(key)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if doc and doc.get('size') == st.st_size and doc.get('mtime') == st.st_mtime_ns:
+            return key
+        return None
+
+    def update_directory(self, directory, stopwords, settings, workers=1, progress=None):
+        """增量更新目录中的 .txt 文本，返回 (新增或更新数, 移除数)
+
+        大小和修改时间都没变的文档直接跳过；变了但内容哈希相同的只更新签名。
+        多篇文档需要分词时按文档并行（map），结果在当前进程中依次合并（reduce）。
+        progress(已处理文档数, 需处理文档数) 可以抛出 OperationCancelled 中止，
+        已合并的文档仍会保存。
+        """
+        with self._update_lock:
+            return self._update_directory(directory, stopwords, settings, workers, progress)
+
+    def _update_directory(self, directory, stopwords, settings, workers, progress):
+        self.load()
+        settings_key = self.settings_key(stopwords, settings)
+        if self.settings != settings_key:
+            self._reset(settings_key)
+
+        prefix = os.path.join(os.path.abspath(directory), '')
+        current = {}
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith('.txt'):
+                        current[os.path.abspath(entry.path)] = entry
+        removed = [key for key in self.docs if key.startswith(prefix) and key not in current]
+
+        batch = _Batch(self.docs)
+        pending = {}  # 需要分词的文档键 -> 签名
+        copies = []   # 与 pending 中某篇内容相同的文档，等那一篇分词后再记入
+        hashes = set()
+        try:
+            for key in removed:
+                self._drop(batch, key)
+            for key, entry in current.items():
+                st = entry.stat()
+                doc = batch.docs.get(key)
+                if doc and doc['size'] == st.st_size and doc['mtime'] == st.st_mtime_ns:
+                    continue
+                signature = {'name': entry.name, 'size': st.st_size, 'mtime': st.st_mtime_ns,
+                             'hash': file_hash(entry.path)}
+                if doc and doc['hash'] == signature['hash']:
+                    batch.docs[key] = signature
+                    continue
+                if batch.refs[signature['hash']]:
+                    self._add(batch, key, {}, signature)  # 内容已收录（如复制的文件），不必分词
+                    continue
+                if signature['hash'] in hashes:
+                    copies.append((key, signature))
+                    continue
+                pending[key] = signature
+                hashes.add(signature['hash'])
+
+            for key, terms in self._map_files(list(pending), stopwords, workers, progress):
+                self._add(batch, key, terms, pending[key])
+            for key, signature in copies:
+                if batch.refs[signature['hash']]:  # 取消时那一篇可能没有分词
+                    self._add(batch, key, {}, signature)
+        finally:
+            self._commit(batch)
+            self.save()
+        return len(pending) + len(copies), len(removed)
+
+    def _map_files(self, paths, stopwords, workers, progress):
+        """依次产出 (路径, 过滤后的词频)"""
+        total = len(paths)
+        if progress:
+            progress(0, total)
+        if not paths:
+            return
+        workers = resolve_workers(workers)
+        if workers <= 1 or total == 1:
+            # 只有一篇时改为在文档内部按段并行
+            _init_worker(frozenset(stopwords))
+            for done, path in enumerate(paths, 1):
+                yield path, count_document(path, workers)
+                if progress:
+                    progress(done, total)
+            return
+
+        pool = ProcessPoolExecutor(max_workers=min(workers, total), initializer=_init_worker,
+                                   initargs=(frozenset(stopwords),))
+        try:
+            futures = {pool.submit(count_document, path): path for path in paths}
+            for done, future in enumerate(as_completed(futures), 1):
+                yield futures[future], future.result()
+                if progress:
+                    progress(done, total)
+        finally:
+            # 取消时不再等待尚未开始的文档
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def update_database(self, store, stopwords, settings, workers=1, progress=None,
+                        page_size=100):
+        """增量更新数据库中的文本，文档键为 db:<ID>，返回 (新增或更新数, 移除数)
+
+        数据库中的文本逐篇流式读取，单篇文本内部按 workers 并行分词。
+        """
+        with self._update_lock:
+            return self._update_database(store, stopwords, settings, workers, progress, page_size)
+
+    def _update_database(self, store, stopwords, settings, workers, progress, page_size):
+        self.load()
+        settings_key = self.settings_key(stopwords, settings)
+        if self.settings != settings_key:
+            self._reset(settings_key)
+
+        items = []
+        after_id = 0
+        while True:
+            page = store.list_items('text', after_id, page_size)
+            if not page:
+                break
+            items.extend(item for item in page if item['name'])
+            after_id = page[-1]['id']
+
+        current = {}  # 文档键 -> (数据库 ID, 签名)
+        for item in items:
+            # 内容哈希列加入之前导入的行没有哈希，按 ID 区分（行的内容不会被修改）
+            digest = item['hash'] or f"db{item['id']}"
+            current[f"db:{item['id']}"] = (item['id'], {'name': item['name'], 'hash': digest})
+        removed = [key for key in self.docs if key.startswith('db:') and key not in current]
+        pending = [(key, item_id, signature) for key, (item_id, signature) in current.items()
+                   if self.docs.get(key, {}).get('hash') != signature['hash']]
+
+        batch = _Batch(self.docs)
+        total = len(pending)
+        try:
+            for key in removed:
+                self._drop(batch, key)
+            if progress:
+                progress(0, total)
+            for done, (key, item_id, signature) in enumerate(pending, 1):
+                if batch.refs[signature['hash']]:
+                    # texts/ 中已有内容相同的文件，只记录文档，不必分词
+                    self._add(batch, key, {}, signature)
+                    if progress:
+                        progress(done, total)
+                    continue
+                chunks = align_chunks(universal_newline_chunks(store.iter_blob(item_id, 'text')))
+                counter = count_token_stream(normalize_chunks(chunks), workers)
+                self._add(batch, key, filter_terms(counter, stopwords), signature)
+                if progress:
+                    progress(done, total)
+        finally:
+            self._commit(batch)
+            self.save()
+        return total, len(removed)
+
+    def weigh(self, counts, doc_key=None):
+        """按 TF-IDF 重新计算权重，返回按权重降序的 {词: 权重}
+
+        内容相同的文档（如 texts 中的文件和数据库中的同一文本）只算一篇。
+        doc_key 为 None 表示文档不在索引中，按“再加入一篇文档”计算。
+        索引中不足两篇文档时 IDF 没有意义，原样返回词频。
+        """
+        with self._lock:
+            df = self.df
+            docs = self.contents
+        extra = 0 if doc_key is not None else 1
+        if docs + extra < 2:
+            return counts
+        weights = {}
+        for word, count in counts.items():
+            weight = count * inverse_document_frequency(df.get(word, 0) + extra, docs + extra)
+            if weight > 0:
+                weights[word] = weight
+        return dict(sorted(weights.items(), key=lambda item: -item[1]))
+
+    def clear(self):
+        """删除磁盘上的索引"""
+        self._reset(None)
+        for path in (self._index_path, self._df_path):
+            if os.path.exists(path):
+                os.remove(path)
+
@@ -0,0 +1,117 @@
+#freqfile.py
+"""紧凑的二进制词频表（.wfq）
+
+文件布局（小端，各数组按 4 字节对齐，可以直接内存映射）:
+    4 字节    魔数 b'WFQ1'
+    uint32    词数 n
+    uint64    词表字节数
+    uint32[n]     词频，从高到低排序
+    uint32[n+1]   每个词在词表中的起始偏移，最后一项为词表总长度
+    bytes         词表，所有词的 UTF-8 编码依次拼接，不含分隔符
+
+读取前 N 个词只需解码词表的前一小段，不必解析整个文件。
+"""
+import os
+import csv
+import mmap
+import struct
+
+import numpy as np
+
+MAGIC = b'WFQ1'
+HEADER = struct.Struct('<4sIQ')
+
+
+def sort_frequencies(words):
+    """按词频降序（相同词频按词）排列，返回 [(词, 次数)]"""
+    return sorted(words.items(), key=lambda item: (-item[1], item[0]))
+
+
+def write_frequency_file(path, words):
+    """把 {词: 次数} 写成 .wfq 文件"""
+    items = sort_frequencies(words)
+    counts = np.fromiter((cnt for _, cnt in items), dtype='<u4', count=len(items))
+    encoded = [w.encode('utf-8') for w, _ in items]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    offsets[1:] = np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+    table = b''.join(encoded)
+
+    out_dir = os.path.dirname(path)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(items), len(table)))
+        f.write(counts.tobytes())
+        f.write(offsets.tobytes())
+        f.write(table)
+    os.replace(tmp_path, path)
+
+
+class FrequencyFile:
+    """以内存映射方式打开的 .wfq 文件，词在访问时才解码"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"不是词频文件: {path}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, table_size = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or size != HEADER.size + 4 * (2 * n + 1) + table_size:
+            self._mmap.close()
+            raise ValueError(f"不是词频文件或文件已损坏: {path}")
+        self.counts = np.frombuffer(self._mmap, dtype='<u4', count=n, offset=HEADER.size)
+        self.offsets = np.frombuffer(self._mmap, dtype='<u4', count=n + 1,
+                                     offset=HEADER.size + 4 * n)
+        self._table = HEADER.size + 4 * (2 * n + 1)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # numpy 视图仍引用映射时不能关闭，交给垃圾回收
+        self.counts = self.offsets = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def words(self, limit=None):
+        """按词频从高到低产出 (词, 次数)"""
+        n = len(self) if limit is None else min(limit, len(self))
+        offsets = self.offsets[:n + 1].tolist()
+        counts = self.counts[:n].tolist()
+        # 一次解码前 n 个词所在的整段词表，再按偏移切分
+        start = self._table
+        raw = self._mmap[start:start + offsets[n]]
+        for i in range(n):
+            yield raw[offsets[i]:offsets[i + 1]].decode('utf-8'), counts[i]
+
+    def top(self, limit=None):
+        """返回前 limit 个词的 {词: 次数}，可以直接传给 generate_from_frequencies"""
+        return dict(self.words(limit))
+
+
+def read_frequency_file(path, limit=None):
+    """读取 .wfq 文件中词频最高的 limit 个词"""
+    with FrequencyFile(path) as table:
+        return table.top(limit)
+
+
+def export_csv(words, csv_path):
+    """把 {词: 次数} 或 FrequencyFile 导出为 CSV（UTF-8 带 BOM，Excel 可以直接打开）"""
+    items = words.words() if isinstance(words, FrequencyFile) else sort_frequencies(words)
+    out_dir = os.path.dirname(csv_path)
+    if out_dir and not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['word', 'count'])
+        writer.writerows(items)
@@ -0,0 +1,123 @@
+#library.py
+import os
+
+from PyQt5.QtCore import (Qt, QAbstractListModel, QFileSystemWatcher, QModelIndex, QTimer)
+
+
+class LibraryModel(QAbstractListModel):
+    """本地文件库（./texts、./thumbnail）的列表模型
+
+    维护 名称 -> 行号 的索引，添加和查找是 O(1)。删除是 O(n)：直接移除该行，
+    其后各行前移一行并更新行号，其他行（包括视图的当前项）不会变成另一个文件；
+    重新扫描时一次删除的多个文件只更新一次行号。新文件追加在末尾。目录由
+    QFileSystemWatcher 监视，短时间内的多次变化合并为一次重新扫描，
+    只对新增和消失的文件做增量更新。
+    """
+    PathRole = Qt.UserRole
+
+    def __init__(self, directory, extensions, parent=None, delay=200):
+        super().__init__(parent)
+        self.directory = directory
+        self.extensions = tuple(extensions)
+        self._names = []  # 行号 -> 名称
+        self._rows = {}   # 名称 -> 行号
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(lambda path: self._timer.start())
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self.refresh)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._names):
+            return None
+        name = self._names[index.row()]
+        if role == Qt.DisplayRole:
+            return name
+        if role == Qt.ToolTipRole or role == self.PathRole:
+            return self.path(name)
+        return None
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def accepts(self, name):
+        return name.lower().endswith(self.extensions)
+
+    def _scan(self):
+        with os.scandir(self.directory) as entries:
+            return {entry.name for entry in entries
+                    if entry.is_file() and self.accepts(entry.name)}
+
+    def load(self):
+        """首次扫描目录并开始监视"""
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        names = sorted(self._scan())
+        self.beginResetModel()
+        self._names = names
+        self._rows = {name: row for row, name in enumerate(names)}
+        self.endResetModel()
+        if self.directory not in self._watcher.directories():
+            self._watcher.addPath(self.directory)
+
+    def refresh(self):
+        """重新扫描目录，只添加新文件、移除已消失的文件"""
+        try:
+            current = self._scan()
+        except OSError as e:
+            print(f"扫描目录失败 {self.directory}: {str(e)}")
+            return
+        self._remove_names([name for name in self._names if name not in current])
+        for name in sorted(current.difference(self._rows)):
+            self.add_item(name)
+
+    def contains(self, name):
+        return name in self._rows
+
+    def find(self, name):
+        """返回名称对应的行号，没有则返回 -1"""
+        return self._rows.get(name, -1)
+
+    def add_item(self, name):
+        """添加条目，已存在时返回 False"""
+        if name in self._rows:
+            return False
+        row = len(self._names)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._names.append(name)
+        self._rows[name] = row
+        self.endInsertRows()
+        return True
+
+    def remove_item(self, name):
+        """按名称移除条目，返回是否找到；其后各行的行号需要更新，是 O(n)"""
+        if name not in self._rows:
+            return False
+        self._remove_names([name])
+        return True
+
+    def _remove_names(self, names):
+        """在原位置删除多行，视图据此调整当前项；不能把其他行移进来，否则当前项会变成另一个文件
+
+        从后往前删除，前面各行的行号不受影响，全部删除后再从最靠前的一行起统一更新行号。
+        """
+        rows = sorted((self._rows[name] for name in names), reverse=True)
+        if not rows:
+            return
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[self._names[row]]
+            del self._names[row]
+            self.endRemoveRows()
+        for i in range(rows[-1], len(self._names)):
+            self._rows[self._names[i]] = i
+        for name in names:
+            self.item_removed(name)
+
+    def item_removed(self, name):
+        """条目被移除后调用，子类可以在这里释放相关资源"""
@@ -5,11 +5,17 @@ import shutil
 from functools import partial
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QFileDialog, QColorDialog,
-                             QMessageBox, QPushButton, QLabel, QMenu)
-from PyQt5.QtGui import QPixmap, QIcon
-from PyQt5.QtCore import Qt, QSize
+                             QMessageBox, QLabel, QMenu)
+from PyQt5.QtGui import QPixmap, QImage
+from PyQt5.QtCore import Qt, QFileSystemWatcher, QTimer
 from ui import WordCloudUI
 from core import WordCloudCore
+from stats import format_stats
+from worker import WordCloudGenerator, DatabaseWorker
+from thumbnails import ThumbnailModel
+from library import LibraryModel
+from storage import find_local_duplicate
+from segment import resolve_workers
 
 
 class WordCloudApp(QMainWindow):
@@ -17,15 +23,43 @@ class WordCloudApp(QMainWindow):
         super().__init__()
         self.ui = WordCloudUI(self)
         self.core = WordCloudCore()
+        self.generator = WordCloudGenerator(self)
+        self.generator.drafted.connect(self.on_wordcloud_drafted)
+        self.generator.finished.connect(self.on_wordcloud_generated)
+        # 数据库操作在线程池中执行，并发数与连接池大小一致
+        pool_size = self.core.store.pool_size if self.core.store else 1
+        self.db_worker = DatabaseWorker(pool_size, self)
+        self.db_worker.progress.connect(self.show_db_progress)
+        self.db_worker.finished.connect(self.on_db_task_finished)
+        self.db_worker.busy_changed.connect(self.ui.btn_cancel_db.setEnabled)
+        # 本地文件库，按名称索引并监视目录变化
+        self.thumbnail_model = ThumbnailModel('./thumbnail', self)
+        self.ui.thumbnail_view.setModel(self.thumbnail_model)
+        self.text_model = LibraryModel('./texts', ('.txt',), self)
+        self.ui.text_list.setModel(self.text_model)
+        # 跟踪文本追加：文件变化时最多每秒重新生成一次，不会被持续写入一直推迟
+        self.text_watcher = QFileSystemWatcher(self)
+        self.text_watcher.fileChanged.connect(self.on_text_file_changed)
+        self.text_change_timer = QTimer(self)
+        self.text_change_timer.setSingleShot(True)
+        self.text_change_timer.setInterval(1000)
+        self.text_change_timer.timeout.connect(self.on_text_appended)
+        # 文本库变化后增量更新语料索引，短时间内的多次变化只更新一次
+        self.corpus_timer = QTimer(self)
+        self.corpus_timer.setSingleShot(True)
+        self.corpus_timer.setInterval(500)
+        self.corpus_timer.timeout.connect(self.update_corpus)
+        self.text_model.rowsInserted.connect(self.on_text_library_changed)
+        self.text_model.rowsRemoved.connect(self.on_text_library_changed)
         self.setup_signals()
         self.init_resources()
         self.load_thumbnails()
         self.load_text_files()
         self.setup_context_menus()
-        self.ui.scale_combo.currentTextChanged.connect(self.update_scale_value)
+
     def setup_context_menus(self):
         # 图片列表右键菜单
-        self.thumbnail_area = self.ui.thumbnail_layout.parent().parent().parent()
+        self.thumbnail_area = self.ui.thumbnail_view
         self.thumbnail_area.setContextMenuPolicy(Qt.CustomContextMenu)
         self.thumbnail_area.customContextMenuRequested.connect(self.show_image_context_menu)
 
@@ -51,11 +85,10 @@ class WordCloudApp(QMainWindow):
             delete_action = menu.addAction("删除图片")
             action = menu.exec_(self.thumbnail_area.mapToGlobal(pos))
             if action == delete_action:
-                # 找出点击的是哪个缩略图按钮
-                widget = self.thumbnail_area.childAt(pos)
-                if widget and isinstance(widget, QPushButton):
-                    image_name = widget.text()
-                    self.delete_image(image_name)
+                # 找出点击的是哪个缩略图
+                index = self.thumbnail_area.indexAt(pos)
+                if index.isValid():
+                    self.delete_image(index.data(Qt.DisplayRole))
         except Exception as e:
             print(f"显示图片右键菜单时出错: {str(e)}")
             QMessageBox.critical(self, "错误", f"操作失败: {str(e)}")
@@ -67,10 +100,9 @@ class WordCloudApp(QMainWindow):
         action = menu.exec_(self.ui.text_list.mapToGlobal(pos))
 
         if action == delete_action:
-            item = self.ui.text_list.itemAt(pos)
-            if item:
-                text_name = item.text()
-                self.delete_text(text_name)
+            index = self.ui.text_list.indexAt(pos)
+            if index.isValid():
+                self.delete_text(index.data(Qt.DisplayRole))
 
 
     def delete_image(self, image_name):
@@ -79,8 +111,18 @@ class WordCloudApp(QMainWindow):
             if not image_name:
                 QMessageBox.warning(self, "警告", "无法确定要删除的图片")
                 return
-            # 从数据库删除
-            success, msg = self.core.delete_from_database(image_name=image_name)
+            # 从数据库删除（后台执行），完成后再删除本地文件和按钮
+            self.db_worker.submit(
+                f"删除图片 {image_name}",
+                lambda report: self.core.delete_from_database(image_name=image_name),
+                partial(self.on_image_deleted, image_name))
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"删除图片时出现错误: {str(e)}")
+            print(f"删除图片时出错: {str(e)}")
+
+    def on_image_deleted(self, image_name, success, msg):
+        """数据库删除完成后更新本地文件和界面"""
+        try:
             if not success:
                 QMessageBox.warning(self, "删除失败", msg)
                 return
@@ -91,17 +133,8 @@ class WordCloudApp(QMainWindow):
                     os.remove(thumbnail_path)
                 except Exception as e:
                     print(f"删除本地文件失败: {str(e)}")
-            # 从UI移除按钮
-            layout = self.ui.thumbnail_layout
-            found_widget = None
-            for i in range(layout.count()):
-                item = layout.itemAt(i)
-                if item and item.widget() and item.widget().text() == image_name:
-                    found_widget = item.widget()
-                    break
-            if found_widget:
-                layout.removeWidget(found_widget)
-                found_widget.deleteLater()
+            # 从列表移除
+            if self.thumbnail_model.remove_item(image_name):
                 QMessageBox.information(self, "成功", f"图片'{image_name}'已删除")
             else:
                 QMessageBox.warning(self, "警告", f"未找到图片'{image_name}'对应的UI元素")
@@ -111,19 +144,22 @@ class WordCloudApp(QMainWindow):
 
     def delete_text(self, text_name):
         """从数据库和本地删除文本"""
-        # 从数据库删除
-        success, msg = self.core.delete_from_database(text_name=text_name)
+        # 从数据库删除（后台执行）
+        self.db_worker.submit(
+            f"删除文本 {text_name}",
+            lambda report: self.core.delete_from_database(text_name=text_name),
+            partial(self.on_text_deleted, text_name))
+
+    def on_text_deleted(self, text_name, success, msg):
+        """数据库删除完成后更新本地文件和界面"""
         if success:
             # 从本地删除文本文件
             text_path = os.path.join('./texts', text_name)
             if os.path.exists(text_path):
                 os.remove(text_path)
 
-            # 从UI移除项
-            for i in range(self.ui.text_list.count()):
-                if self.ui.text_list.item(i).text() == text_name:
-                    self.ui.text_list.takeItem(i)
-                    break
+            # 从列表移除
+            self.text_model.remove_item(text_name)
 
             QMessageBox.information(self, "成功", "文本已删除")
         else:
@@ -140,6 +176,7 @@ class WordCloudApp(QMainWindow):
         self.ui.btn_update.clicked.connect(self.update_wordcloud)
         self.ui.btn_export.clicked.connect(self.export_wordcloud)
         self.ui.btn_save_as.clicked.connect(self.save_as_wordcloud)
+        self.ui.btn_export_freq.clicked.connect(self.export_frequencies)
 
         # 颜色选择信号
         self.ui.btn_base_color.clicked.connect(self.choose_base_color)
@@ -148,11 +185,21 @@ class WordCloudApp(QMainWindow):
         self.ui.btn_bg_color.clicked.connect(self.choose_bg_color)
 
         self.ui.scale_combo.currentTextChanged.connect(self.update_scale_value)
-        self.ui.text_list.currentTextChanged.connect(self.on_text_selected)
+        self.ui.chk_watch_text.toggled.connect(self.set_watch_text)
+        self.ui.weighting_combo.currentIndexChanged.connect(self.on_weighting_changed)
+        self.ui.workers_combo.currentIndexChanged.connect(self.on_workers_changed)
+        self.ui.chk_trace_memory.toggled.connect(self.set_trace_memory)
+        self.ui.btn_update_corpus.clicked.connect(self.update_corpus)
+        self.ui.text_list.selectionModel().currentChanged.connect(
+            lambda current, previous: self.on_text_selected(current.data(Qt.DisplayRole)))
+        self.ui.thumbnail_view.clicked.connect(
+            lambda index: self.thumbnail_clicked(index.data(ThumbnailModel.PathRole)))
 
         # 数据库操作信号
         self.ui.btn_add_text.clicked.connect(self.add_text_to_db)
         self.ui.btn_add_image.clicked.connect(self.add_image_to_db)
+        self.ui.btn_import_dir.clicked.connect(self.import_dir_to_db)
+        self.ui.btn_cancel_db.clicked.connect(self.db_worker.cancel_all)
 
 
     def init_resources(self):
@@ -180,6 +227,7 @@ class WordCloudApp(QMainWindow):
                 self.text_file_path = path
                 self.core.text_file_path = path
                 self.add_text_file(os.path.basename(path))
+                self.update_text_watch()
             elif file_type == 'font':
                 self.core.font_path = path
 
@@ -201,6 +249,11 @@ class WordCloudApp(QMainWindow):
             fname = os.path.basename(path)
             dest_path = os.path.join(thumbnail_dir, fname)
 
+            duplicate = find_local_duplicate(path, thumbnail_dir)
+            if duplicate:
+                print(f"缩略图已存在相同内容的文件: {duplicate}")
+                return
+
             if os.path.abspath(path) != os.path.abspath(dest_path):  # 避免相同文件
                 if os.path.exists(dest_path):
                     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -214,38 +267,33 @@ class WordCloudApp(QMainWindow):
             print(f"保存缩略图失败: {str(e)}")
 
     def add_thumbnail(self, name, path):
-        """添加缩略图按钮"""
-        btn = QPushButton(name)
-        btn.setIcon(QIcon(path))
-        btn.setIconSize(QSize(180, 120))
-        btn.setStyleSheet("background-color: white;")
-        btn.clicked.connect(partial(self.thumbnail_clicked, path))
-        self.ui.thumbnail_layout.addWidget(btn)
+        """添加缩略图，图标在显示时才在后台加载"""
+        self.thumbnail_model.add_item(name)
 
     def load_thumbnails(self):
-        """加载缩略图"""
-        thumbnail_dir = './thumbnail'
-        if not os.path.exists(thumbnail_dir):
-            os.makedirs(thumbnail_dir)
-        for fname in os.listdir(thumbnail_dir):
-            if fname.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
-                self.add_thumbnail(fname, os.path.join(thumbnail_dir, fname))
+        """加载缩略图列表（只列出文件，不解码图片），之后随目录变化增量更新"""
+        self.thumbnail_model.load()
 
     def load_text_files(self):
-        """加载文本文件列表"""
+        """加载文本文件列表，之后随目录变化增量更新"""
+        self.text_model.load()
+
+    def save_text_copy(self, path):
+        """在 ./texts 中保存文本副本，内容相同的文件只保留一份，返回本地文件名"""
         texts_dir = './texts'
         if not os.path.exists(texts_dir):
             os.makedirs(texts_dir)
-        self.ui.text_list.clear()
-        for fname in os.listdir(texts_dir):
-            if fname.lower().endswith('.txt'):
-                self.ui.text_list.addItem(fname)
+        duplicate = find_local_duplicate(path, texts_dir)
+        if duplicate:
+            return os.path.basename(duplicate)
+        dest_path = os.path.join(texts_dir, os.path.basename(path))
+        if not os.path.exists(dest_path):
+            shutil.copy2(path, dest_path)
+        return os.path.basename(dest_path)
 
     def add_text_file(self, fname):
-        """添加文本文件到列表"""
-        if fname not in [self.ui.text_list.item(i).text()
-                         for i in range(self.ui.text_list.count())]:
-            self.ui.text_list.addItem(fname)
+        """添加文本文件到列表，已存在时忽略"""
+        self.text_model.add_item(fname)
 
     def thumbnail_clicked(self, path):
         """缩略图点击事件"""
@@ -261,10 +309,69 @@ class WordCloudApp(QMainWindow):
             path = os.path.join('./texts', text)
             self.text_file_path = path
             self.core.text_file_path = path
+            self.update_text_watch()
             print(f"选择的文本文件: {path}")
             if self.all_files_selected():
                 self.update_wordcloud()
 
+    def set_watch_text(self, enabled):
+        """开启或关闭对当前文本文件的跟踪"""
+        self.core.watch_text = enabled
+        self.update_text_watch()
+
+    def update_text_watch(self):
+        """只监视当前选中的文本文件"""
+        files = self.text_watcher.files()
+        if files:
+            self.text_watcher.removePaths(files)
+        if self.core.watch_text and self.text_file_path:
+            self.text_watcher.addPath(self.text_file_path)
+
+    def on_text_file_changed(self, path):
+        # 部分编辑器保存时先删除再重建文件，监视会因此失效，需要重新添加
+        if path not in self.text_watcher.files() and os.path.exists(path):
+            self.text_watcher.addPath(path)
+        if not self.text_change_timer.isActive():
+            self.text_change_timer.start()
+
+    def on_text_appended(self):
+        """文本文件有新内容：只统计追加的部分并重新生成"""
+        self.core.text_revision += 1
+        if self.all_files_selected():
+            self.update_wordcloud()
+
+    def on_weighting_changed(self, index):
+        """切换词频 / TF-IDF 权重，首次使用 TF-IDF 时先建立语料索引"""
+        self.core.weighting = self.ui.weighting_combo.itemData(index)
+        if self.core.weighting == 'tfidf':
+            self.update_corpus()
+        elif self.all_files_selected():
+            self.update_wordcloud()
+
+    def on_workers_changed(self, index):
+        """设置分词进程数，只影响速度，分词结果不变，不需要重新生成"""
+        self.core.workers = resolve_workers(self.ui.workers_combo.itemData(index))
+
+    def set_trace_memory(self, enabled):
+        """开启后每次生成都统计峰值内存并显示在状态栏"""
+        self.core.trace_memory = enabled
+
+    def on_text_library_changed(self, *args):
+        if self.core.weighting == 'tfidf':
+            self.corpus_timer.start()
+
+    def update_corpus(self):
+        """在后台增量更新 texts 目录和数据库文本的语料索引，只对新增和修改过的文本分词"""
+        self.db_worker.submit(
+            "更新语料索引",
+            lambda report: self.core.update_corpus('./texts', progress=report),
+            self.on_corpus_updated)
+
+    def on_corpus_updated(self, success, msg):
+        print(msg)
+        if success and self.core.weighting == 'tfidf' and self.all_files_selected():
+            self.update_wordcloud()
+
     # 颜色操作方法
     def choose_base_color(self):
         """选择基础颜色"""
@@ -274,7 +381,7 @@ class WordCloudApp(QMainWindow):
             self.core.base_color = color_hex
             self.ui.lbl_base_color.setStyleSheet(f"background-color: {color_hex};")
             if self.all_files_selected():
-                self.update_wordcloud()
+                self.recolor_wordcloud()
 
     def choose_similar_color(self):
         """选择相似颜色"""
@@ -284,7 +391,7 @@ class WordCloudApp(QMainWindow):
             self.core.similar_colors.append(color_hex)
             self.add_color_label(color_hex, self.ui.similar_layout)
             if self.all_files_selected():
-                self.update_wordcloud()
+                self.recolor_wordcloud()
 
     def choose_contrast_color(self):
         """选择对比颜色"""
@@ -294,7 +401,7 @@ class WordCloudApp(QMainWindow):
             self.core.contrast_colors.append(color_hex)
             self.add_color_label(color_hex, self.ui.contrast_layout)
             if self.all_files_selected():
-                self.update_wordcloud()
+                self.recolor_wordcloud()
 
     def choose_bg_color(self):
         """选择背景颜色"""
@@ -304,7 +411,7 @@ class WordCloudApp(QMainWindow):
             self.core.bg_color = color_hex
             self.ui.lbl_bg_color.setStyleSheet(f"background-color: {color_hex};")
             if self.all_files_selected():
-                self.update_wordcloud()
+                self.recolor_wordcloud()
 
     def add_color_label(self, color_hex, layout):
         """添加颜色标签"""
@@ -315,18 +422,52 @@ class WordCloudApp(QMainWindow):
 
     # 词云操作方法
     def update_wordcloud(self):
-        """更新词云图"""
+        """更新词云图（后台生成）"""
+        self.core.set_font(self.ui.font_combobox.currentText())
+        self.generator.request(self.core.snapshot())
+
+    def on_wordcloud_drafted(self, image):
+        """先显示低分辨率草图，完整图生成后替换"""
+        self.show_wordcloud(image)
+
+    def on_wordcloud_generated(self, job, success, message):
+        """后台生成完成"""
+        if success:
+            self.core.adopt(job)
+            self.show_wordcloud()
+            self.show_stats()
+        else:
+            QMessageBox.warning(self, "生成失败", message)
+
+    def recolor_wordcloud(self):
+        """仅更新颜色，复用已有布局"""
         self.core.set_font(self.ui.font_combobox.currentText())
-        success, message = self.core.generate_wordcloud()
+        if self.generator.is_busy() or not self.core.can_recolor():
+            # 布局已失效或即将变化，交给后台任务按最新颜色生成
+            self.update_wordcloud()
+            return
+        success, message = self.core.recolor_wordcloud()
         if success:
+            self.generator.mark_rendered(self.core.params_key())
             self.show_wordcloud()
+            self.show_stats()
         else:
             QMessageBox.warning(self, "生成失败", message)
 
-    def show_wordcloud(self):
-        """显示词云图"""
-        if os.path.exists('./wordcloud.png'):
-            pixmap = QPixmap('./wordcloud.png')
+    def show_stats(self):
+        """在状态栏显示最近一次生成的耗时摘要"""
+        if self.core.last_stats:
+            self.statusBar().showMessage(format_stats(self.core.last_stats))
+
+    def show_wordcloud(self, image=None):
+        """显示词云图，直接从内存中的图像构建，不经过文件"""
+        if image is None:
+            image = self.core.image
+        if image is not None:
+            image = image.convert('RGB')
+            data = image.tobytes('raw', 'RGB')
+            qimage = QImage(data, image.width, image.height, image.width * 3, QImage.Format_RGB888)
+            pixmap = QPixmap.fromImage(qimage)
             if pixmap.width() > self.ui.wordcloud_label.width():
                 pixmap = pixmap.scaled(
                     self.ui.wordcloud_label.width(),
@@ -337,21 +478,24 @@ class WordCloudApp(QMainWindow):
 
     def export_wordcloud(self):
         """导出词云图"""
-        if os.path.exists('./wordcloud.png'):
+        if self.core.image is not None:
             export_dir = './export'
             if not os.path.exists(export_dir):
                 os.makedirs(export_dir)
 
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             export_path = os.path.join(export_dir, f'wordcloud_{timestamp}.png')
-            shutil.copy2('./wordcloud.png', export_path)
-            QMessageBox.information(self, "导出成功", f"文件已导出到: {export_path}")
+            success, msg = self.core.save_image(export_path)
+            if success:
+                QMessageBox.information(self, "导出成功", f"文件已导出到: {export_path}")
+            else:
+                QMessageBox.warning(self, "导出失败", msg)
         else:
             QMessageBox.warning(self, "导出失败", "没有可以导出的词云文件")
 
     def save_as_wordcloud(self):
         """另存为词云图"""
-        if os.path.exists('./wordcloud.png'):
+        if self.core.image is not None:
             path, _ = QFileDialog.getSaveFileName(
                 self,
                 "保存词云图",
@@ -359,32 +503,66 @@ class WordCloudApp(QMainWindow):
                 "PNG文件 (*.png);;JPEG文件 (*.jpg *.jpeg);;BMP文件 (*.bmp)"
             )
             if path:
-                shutil.copy2('./wordcloud.png', path)
-                QMessageBox.information(self, "保存成功", f"文件已保存到: {path}")
+                success, msg = self.core.save_image(path)
+                if success:
+                    QMessageBox.information(self, "保存成功", msg)
+                else:
+                    QMessageBox.warning(self, "保存失败", msg)
         else:
             QMessageBox.warning(self, "保存失败", "没有可以保存的词云文件")
 
+    def export_frequencies(self):
+        """导出当前文本的词频表（二进制 .wfq 或 CSV）"""
+        if not self.text_file_path:
+            QMessageBox.warning(self, "导出失败", "请先选择文本文件")
+            return
+        base = os.path.splitext(os.path.basename(self.text_file_path))[0]
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "导出词频",
+            os.path.join('./counts', f'{base}.wfq'),
+            "词频文件 (*.wfq);;CSV文件 (*.csv)"
+        )
+        if path:
+            # 未缓存的文本需要分词，在后台执行，不阻塞界面
+            job = self.core.snapshot()
+            self.db_worker.submit(
+                f"导出词频 {os.path.basename(path)}",
+                lambda report: job.export_frequencies(path),
+                self.on_frequencies_exported)
+
+    def on_frequencies_exported(self, success, msg):
+        if success:
+            QMessageBox.information(self, "导出成功", msg)
+        else:
+            QMessageBox.warning(self, "导出失败", msg)
+
     # 数据库操作方法
+    def show_db_progress(self, task, done, total):
+        """在状态栏显示后台数据库操作的进度"""
+        if total:
+            self.statusBar().showMessage(f"{task.label}: {done * 100 // total}%")
+
+    def on_db_task_finished(self, task, success, message):
+        self.statusBar().showMessage(f"{task.label}: {message}", 5000)
+
+    def closeEvent(self, event):
+        """关闭窗口前取消未完成的数据库操作，等待其回滚和正在生成的词云结束"""
+        self.db_worker.cancel_all()
+        self.generator.shutdown()
+        self.db_worker.wait()
+        super().closeEvent(event)
+
     def add_text_to_db(self):
         """添加文本到数据库"""
         path, _ = QFileDialog.getOpenFileName(self, "选择文本文件", "", "Text Files (*.txt)")
         if path:
             path = os.path.normpath(path)
-            success, msg = self.core.add_to_database(text_path=path)
-            if success:
-                QMessageBox.information(self, "成功", msg)
-                # 创建本地副本
-                texts_dir = './texts'
-                if not os.path.exists(texts_dir):
-                    os.makedirs(texts_dir)
-                dest_path = os.path.join(texts_dir, os.path.basename(path))
-                if not os.path.exists(dest_path):
-                    shutil.copy2(path, dest_path)
-                # 更新文本列表
-                text_name = os.path.basename(path)
-                self.add_text_file(text_name)
-            else:
-                QMessageBox.warning(self, "失败", msg)
+            job = self.core.snapshot()
+            self.db_worker.submit(
+                f"添加 {os.path.basename(path)}",
+                lambda report: job.add_to_database(text_path=path, progress=report),
+                partial(self.on_added_to_db, None, path))
 
     def add_image_to_db(self):
         """添加图片到数据库"""
@@ -392,13 +570,39 @@ class WordCloudApp(QMainWindow):
                                               "", "Image Files (*.png *.jpg *.jpeg *.bmp)")
         if path:
             path = os.path.normpath(path)
-            success, msg = self.core.add_to_database(image_path=path)
-            if success:
-                QMessageBox.information(self, "成功", msg)
-                # 创建本地副本并添加缩略图
-                self.save_thumbnail(path)
-            else:
-                QMessageBox.warning(self, "失败", msg)
+            job = self.core.snapshot()
+            self.db_worker.submit(
+                f"添加 {os.path.basename(path)}",
+                lambda report: job.add_to_database(image_path=path, progress=report),
+                partial(self.on_added_to_db, path, None))
+
+    def on_added_to_db(self, image_path, text_path, success, msg):
+        """后台添加完成"""
+        if success:
+            QMessageBox.information(self, "成功", msg)
+            # 创建本地副本并更新UI
+            if image_path:
+                self.save_thumbnail(image_path)
+            if text_path:
+                self.add_text_file(self.save_text_copy(text_path))
+        else:
+            QMessageBox.warning(self, "失败", msg)
+
+    def import_dir_to_db(self):
+        """批量导入文件夹中的图片和文本到数据库"""
+        directory = QFileDialog.getExistingDirectory(self, "选择要导入的文件夹")
+        if directory:
+            directory = os.path.normpath(directory)
+            self.db_worker.submit(
+                f"导入 {os.path.basename(directory)}",
+                lambda report: self.core.import_directory(directory, progress=report),
+                self.on_dir_imported)
+
+    def on_dir_imported(self, success, msg):
+        if success:
+            QMessageBox.information(self, "成功", msg)
+        else:
+            QMessageBox.warning(self, "失败", msg)
 
     def add_both_to_db(self):
         """同时添加图片和文本到数据库"""
@@ -415,22 +619,12 @@ class WordCloudApp(QMainWindow):
         image_path = os.path.normpath(image_path)
         text_path = os.path.normpath(text_path)
 
-        success, msg = self.core.add_to_database(image_path=image_path, text_path=text_path)
-        if success:
-            QMessageBox.information(self, "成功", msg)
-            # 创建本地副本
-            texts_dir = './texts'
-            if not os.path.exists(texts_dir):
-                os.makedirs(texts_dir)
-            dest_text_path = os.path.join(texts_dir, os.path.basename(text_path))
-            if not os.path.exists(dest_text_path):
-                shutil.copy2(text_path, dest_text_path)
-            # 更新UI
-            self.save_thumbnail(image_path)
-            self.add_text_file(os.path.basename(text_path))
-        else:
-            QMessageBox.warning(self, "失败", msg)
-
+        job = self.core.snapshot()
+        self.db_worker.submit(
+            f"添加 {os.path.basename(image_path)}、{os.path.basename(text_path)}",
+            lambda report: job.add_to_database(image_path=image_path, text_path=text_path,
+                                               progress=report),
+            partial(self.on_added_to_db, image_path, text_path))
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,239 @@
+#segment.py
+import os
+import re
+import threading
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import jieba
+
+# 分词前需要去除的标点及空白
+PUNCTUATION = ['，', '。', '！', '？', '、', '：', '；', '（', '）', '《', '》',
+               '“', '”', '‘', '’', '【', '】', '—', '…', '·', '～', ' ']
+_PUNCT_TABLE = str.maketrans({char: None for char in PUNCTUATION})
+
+# 流式读取时每段的字符数
+CHUNK_CHARS = 1024 * 1024
+
+# 章回标题，如“第一回”“第十二回”，优先在其前面切分
+CHAPTER_RE = re.compile(r'\n(?=\s*第[一二三四五六七八九十百千零〇\d]+[回章节])')
+
+# 文本较短时多进程的启动开销大于收益
+PARALLEL_MIN_CHARS = 200000
+
+
+def resolve_workers(workers):
+    """workers 为 None 或 0 时使用全部 CPU 核心"""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def split_text(text, parts):
+    """在换行处把文本切成约 parts 段
+
+    jieba 本身会在换行等非汉字字符处断开分词块，因此在换行处切分
+    不会改变分词结果。附近有章回标题时优先切在标题前。
+    """
+    if parts <= 1 or not text:
+        return [text]
+
+    target = max(1, len(text) // parts)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + target
+        if end >= len(text):
+            chunks.append(text[start:])
+            break
+        # 在目标位置附近找章回标题，找不到再退回最近的换行
+        match = CHAPTER_RE.search(text, end, min(len(text), end + target // 4))
+        cut = match.start() if match else text.find('\n', end)
+        if cut == -1:
+            chunks.append(text[start:])
+            break
+        chunks.append(text[start:cut + 1])
+        start = cut + 1
+    return chunks
+
+
+def iter_text_chunks(path, chunk_size=CHUNK_CHARS, encoding='utf-8'):
+    """按行累积读取文本，每次产出约 chunk_size 个字符，结尾对齐到换行
+
+    超过 chunk_size 的单行会被强行截断，只有这种情况下边界处的分词
+    可能与整篇读取略有不同。
+    """
+    with open(path, 'r', encoding=encoding) as f:
+        buf = []
+        size = 0
+        while True:
+            line = f.readline(chunk_size)
+            if not line:
+                break
+            buf.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                yield ''.join(buf)
+                buf = []
+                size = 0
+        if buf:
+            yield ''.join(buf)
+
+
+def align_chunks(chunks):
+    """把任意切分的文本段重新对齐到换行处，使分词结果与整篇处理一致"""
+    carry = ''
+    for chunk in chunks:
+        chunk = carry + chunk
+        cut = chunk.rfind('\n')
+        if cut == -1:
+            carry = chunk
+            continue
+        carry = chunk[cut + 1:]
+        yield chunk[:cut + 1]
+    if carry:
+        yield carry
+
+
+def normalize_text(text):
+    """一次遍历去除标点"""
+    return text.translate(_PUNCT_TABLE)
+
+
+def normalize_chunks(chunks):
+    for chunk in chunks:
+        yield normalize_text(chunk)
+
+
+def segment_chunk(text):
+    """对一段文本分词并计数（可在子进程中运行）"""
+    return Counter(jieba.lcut(text))
+
+
+def count_tokens(text, workers=1):
+    """分词计数，workers > 1 时按段并行并合并结果
+
+    按段顺序合并 Counter，词的首次出现顺序与单进程一致，
+    因此结果（包括并列词频的顺序）与单进程完全相同。
+    """
+    workers = resolve_workers(workers)
+    if workers <= 1 or len(text) < PARALLEL_MIN_CHARS:
+        return segment_chunk(text)
+
+    chunks = split_text(text, workers * 4)  # 多切几段以均衡负载
+    if len(chunks) <= 1:
+        return segment_chunk(text)
+    return count_token_stream(chunks, workers)
+
+
+def count_token_stream(chunks, workers=1):
+    """对文本段的可迭代对象增量分词计数，任何时刻只持有少量文本段
+
+    并行时最多同时提交 workers * 2 段，并按提交顺序合并结果。
+    """
+    workers = resolve_workers(workers)
+    counter = Counter()
+    if workers <= 1:
+        for chunk in chunks:
+            counter.update(segment_chunk(chunk))
+        return counter
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=jieba.initialize) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(segment_chunk, chunk))
+            if len(pending) >= workers * 2:
+                counter.update(pending.popleft().result())
+        while pending:
+            counter.update(pending.popleft().result())
+    return counter
+
+
+def _universal_newlines(text):
+    """与文本模式读取一致，把 \\r\\n 和 \\r 换成 \\n"""
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def universal_newline_chunks(chunks):
+    """流式版本的 _universal_newlines，段尾的 \\r 留到下一段，跨段的 \\r\\n 只算一个换行
+
+    数据库中的文本按原始字节存储，读出的段保留 \\r\\n，不处理会被分词成一个“词”。
+    """
+    carry = ''
+    for chunk in chunks:
+        chunk = carry + chunk
+        carry = ''
+        if chunk.endswith('\r'):
+            chunk, carry = chunk[:-1], '\r'
+        if chunk:
+            yield _universal_newlines(chunk)
+    if carry:
+        yield '\n'
+
+
+class IncrementalCounter:
+    """跟踪不断追加的文本文件（聊天记录、日志），只对新增部分分词并累加计数
+
+    记住已处理到的字节偏移，末尾尚未写完的一行留到下次与新内容拼接，
+    因此与整篇重新统计的结果一致。文件变短或被替换（如日志轮转）时从头统计。
+    """
+
+    def __init__(self, path, workers=1, chunk_size=CHUNK_CHARS):
+        self.path = path
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counter = Counter()
+        self.offset = 0         # 已读取的字节数
+        self._partial = b''     # 已读取但还没有换行结尾的部分
+        self._file_id = None
+
+    def update(self):
+        """读取上次之后追加的内容并计数，返回本次读取的字节数"""
+        with self._lock:
+            st = os.stat(self.path)
+            file_id = (st.st_dev, st.st_ino)
+            if file_id != self._file_id or st.st_size < self.offset:
+                self.reset()
+                self._file_id = file_id
+            if st.st_size == self.offset:
+                return 0
+
+            start, partial = self.offset, self._partial
+            try:
+                with open(self.path, 'rb') as f:
+                    f.seek(self.offset)
+                    counter = count_token_stream(normalize_chunks(self._read_lines(f)),
+                                                 self.workers)
+            except Exception:
+                # 解码或分词失败时不推进偏移，下次重试
+                self.offset, self._partial = start, partial
+                raise
+            self.counter.update(counter)
+            return self.offset - start
+
+    def _read_lines(self, f):
+        """产出以换行结尾的完整文本段，同时推进偏移"""
+        for block in iter(lambda: f.read(self.chunk_size), b''):
+            self.offset += len(block)
+            block = self._partial + block
+            cut = block.rfind(b'\n')
+            if cut == -1:
+                self._partial = block
+                continue
+            self._partial = block[cut + 1:]
+            yield _universal_newlines(block[:cut + 1].decode('utf-8'))
+
+    def counts(self):
+        """当前的完整计数，包括末尾未写完的一行（不计入累计结果）
+
+        返回副本，调用方在锁外遍历时不受之后的 update() 影响。
+        """
+        with self._lock:
+            if not self._partial.strip():
+                return Counter(self.counter)
+            tail = normalize_text(_universal_newlines(self._partial.decode('utf-8', errors='ignore')))
+            return self.counter + segment_chunk(tail)
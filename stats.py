@@ -0,0 +1,91 @@
+#stats.py
+import io
+import time
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+# 各阶段在摘要中显示的名称
+STAGE_NAMES = {
+    'cache_lookup': '缓存查询',
+    'freq_file': '读取词频文件',
+    'db_frequencies': '读取词频',
+    'segment': '分词',
+    'filter': '停用词过滤',
+    'tfidf': 'TF-IDF 加权',
+    'mask': '遮罩',
+    'draft': '草图',
+    'layout': '布局',
+    'render': '渲染',
+    'recolor': '着色',
+    'encode': '编码',
+}
+
+
+class GenerationStats:
+    """记录一次生成的各阶段耗时、词数、遮罩尺寸和峰值内存"""
+
+    def __init__(self, trace_memory=False, profile=False):
+        self.trace_memory = trace_memory
+        self.data = {
+            'stages': {},
+            'total': None,
+            'frequency_cache': None,  # 'hit' / 'miss'
+            'tokens': None,
+            'unique_words': None,
+            'words': None,
+            'mask_shape': None,
+            'peak_bytes': None,
+            'profile': None,
+        }
+        self._profiler = cProfile.Profile() if profile else None
+        self._start = None
+        self._started_tracing = False
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self._profiler:
+            self._profiler.enable()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        self.data['total'] = time.perf_counter() - self._start
+        if self._profiler:
+            self._profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(30)
+            self.data['profile'] = out.getvalue()
+        if self._started_tracing:
+            self.data['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return self.data
+
+    @contextmanager
+    def stage(self, name):
+        """累计某个阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = self.data['stages']
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def format_stats(stats):
+    """把统计信息格式化为一行摘要，用于状态栏"""
+    parts = [f"{STAGE_NAMES.get(name, name)} {seconds:.2f}s"
+             for name, seconds in stats['stages'].items()]
+    if stats['total'] is not None:
+        parts.append(f"共 {stats['total']:.2f}s")
+    if stats['words'] is not None:
+        parts.append(f"词数 {stats['words']}")
+    if stats['frequency_cache'] == 'hit':
+        parts.append("词频缓存命中")
+    if stats['mask_shape']:
+        parts.append(f"遮罩 {stats['mask_shape'][1]}×{stats['mask_shape'][0]}")
+    if stats['peak_bytes'] is not None:
+        parts.append(f"峰值内存 {stats['peak_bytes'] / 1024 / 1024:.1f}MB")
+    return ' | '.join(parts)
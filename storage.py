@@ -0,0 +1,1109 @@
+#storage.py
+import os
+import codecs
+import queue
+import hashlib
+import sqlite3
+import tempfile
+import time
+import zlib
+import threading
+from contextlib import contextmanager
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp')
+TEXT_EXTS = ('.txt',)
+# WordFrequency.Word 列的最大长度，更长的“词”不写入词频表
+MAX_WORD_LEN = 100
+# WordFrequency.Word 的排序规则：按二进制比较，与分词结果一样区分大小写和全半角
+WORD_COLLATION = 'Latin1_General_100_BIN2'
+# 流式读写内容时每段的大小（字节或字符）
+BLOB_CHUNK_SIZE = 1024 * 1024
+# 批量导入时超过该大小的文件单独流式写入，不放进批次
+STREAM_THRESHOLD = 8 * 1024 * 1024
+# 批量导入时每批内容的字节数上限，与 batch_size 先到者为准
+BATCH_BYTES = 4 * 1024 * 1024
+# 可选的内容压缩格式，zstd 需要安装 zstandard
+CODECS = ('zlib', 'zstd')
+# 只压缩本身未压缩的图片格式，png/jpg 再压缩几乎没有收益
+COMPRESSIBLE_IMAGE_EXTS = ('.bmp',)
+
+
+def content_hash(data):
+    """内容哈希（SHA-256 十六进制），用于去重"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """分块计算文件内容哈希，与 content_hash 结果一致"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class OperationCancelled(Exception):
+    """数据库操作被取消，已执行的部分会回滚"""
+
+
+def iter_file_chunks(path, is_text, chunk_size=BLOB_CHUNK_SIZE, on_chunk=None):
+    """分段读取文件，文本按 UTF-8 解码为 str（保留原始换行），图片为 bytes
+
+    on_chunk(字节数) 在每读取一段后调用，可以抛出 OperationCancelled 中止读取。
+    """
+    chunks = _read_file_chunks(path, chunk_size, on_chunk)
+    return decode_chunks(chunks) if is_text else chunks
+
+
+def _read_file_chunks(path, chunk_size, on_chunk):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            if on_chunk:
+                on_chunk(len(chunk))
+            yield chunk
+
+
+def resolve_codec(codec):
+    """检查压缩格式名称，返回 None（不压缩）、'zlib' 或 'zstd'
+
+    zstd 需要可选依赖 zstandard，未安装时改用 zlib。
+    """
+    if not codec or codec.lower() == 'none':
+        return None
+    codec = codec.lower()
+    if codec not in CODECS:
+        raise ValueError(f"未知的压缩格式: {codec}")
+    if codec == 'zstd':
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            print("未安装 zstandard，改用 zlib 压缩")
+            return 'zlib'
+    return codec
+
+
+def _compressobj(codec):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return zlib.compressobj(6)
+
+
+def _decompressobj(codec):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj()
+    if codec == 'zlib':
+        return zlib.decompressobj()
+    raise ValueError(f"未知的压缩格式: {codec}")
+
+
+def compress_chunks(chunks, codec):
+    """流式压缩 bytes 段"""
+    c = _compressobj(codec)
+    for chunk in chunks:
+        out = c.compress(chunk)
+        if out:
+            yield out
+    yield c.flush()
+
+
+def decompress_chunks(chunks, codec):
+    """流式解压 bytes 段，Python 中同时只持有一段的解压结果"""
+    d = _decompressobj(codec)
+    for chunk in chunks:
+        out = d.decompress(chunk)
+        if out:
+            yield out
+    tail = d.flush()
+    if tail:
+        yield tail
+
+
+def decode_chunks(chunks):
+    """把 UTF-8 bytes 段解码为 str 段，多字节字符可以跨段"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def find_local_duplicate(path, directory):
+    """在本地目录中查找与 path 内容相同的文件，先比较大小再比较哈希"""
+    if not os.path.isdir(directory):
+        return None
+    size = os.path.getsize(path)
+    digest = None
+    for fname in os.listdir(directory):
+        candidate = os.path.join(directory, fname)
+        if not os.path.isfile(candidate) or os.path.getsize(candidate) != size:
+            continue
+        if os.path.abspath(candidate) == os.path.abspath(path):
+            return candidate
+        if digest is None:
+            digest = file_hash(path)
+        if file_hash(candidate) == digest:
+            return candidate
+    return None
+
+
+def iter_import_files(directory, recursive=True):
+    """遍历目录，产出 (类型, 路径)，类型为 'image' 或 'text'"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for fname in sorted(files):
+            lower = fname.lower()
+            if lower.endswith(IMAGE_EXTS):
+                yield 'image', os.path.join(root, fname)
+            elif lower.endswith(TEXT_EXTS):
+                yield 'text', os.path.join(root, fname)
+        if not recursive:
+            break
+
+
+class WordCloudStore:
+    """WordCloudData 存储接口
+
+    连接在后台线程中建立（connect_async），第一次真正使用时若尚未就绪则等待；
+    用过的连接放回连接池复用。子类实现 _connect、_ensure_version_table 及各种
+    数据库相关的 SQL，并在 MIGRATIONS 中按版本列出建表和升级步骤。
+
+    compression 为 'zlib' 或 'zstd' 时，新写入的文本（UTF-8）和未压缩格式的图片
+    压缩后存储，并在 TextCodec/ImageCodec 列记录格式；读取时按该列透明解压，
+    未压缩的旧数据照常读取。
+    """
+
+    # [(版本号, [步骤, ...])]，步骤为 SQL 字符串或 callable(cursor)，
+    # 每个步骤都要能在已部分升级的数据库上重复执行
+    MIGRATIONS = []
+
+    def __init__(self, pool_size=4, compression=None):
+        self.pool_size = pool_size
+        self.compression = resolve_codec(compression)
+        self.error = None  # 最近一次连接失败的原因
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        raise NotImplementedError
+
+    def _ensure_version_table(self, cursor):
+        """创建 SchemaVersion 表（只有一行），新库版本为 0"""
+        raise NotImplementedError
+
+    def schema_version(self, cursor):
+        cursor.execute("SELECT Version FROM SchemaVersion")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def migrate(self, conn):
+        """把数据库升级到最新版本，每个版本单独提交"""
+        cursor = conn.cursor()
+        self._ensure_version_table(cursor)
+        conn.commit()
+        current = self.schema_version(cursor)
+        for version, steps in self.MIGRATIONS:
+            if version <= current:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute("UPDATE SchemaVersion SET Version=?", (version,))
+            conn.commit()
+            print(f"数据库已升级到版本 {version}")
+
+    def connect_async(self):
+        """在后台线程中连接并建表，不阻塞调用方"""
+        thread = threading.Thread(target=self._connect_quietly, daemon=True)
+        thread.start()
+        return thread
+
+    def _connect_quietly(self):
+        try:
+            self.ensure_ready()
+        except Exception as e:
+            print(f"数据库连接失败: {str(e)}")
+
+    def ensure_ready(self):
+        """确保已连接并建表，失败时抛出异常，下次调用会重试"""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            try:
+                conn = self._connect()
+                self.migrate(conn)
+            except Exception as e:
+                self.error = e
+                raise
+            self.error = None
+            self._ready = True
+            self._release(conn)
+
+    def is_ready(self):
+        return self._ready
+
+    @contextmanager
+    def connection(self):
+        """从连接池取出一个连接，出错时回滚，用完放回"""
+        self.ensure_ready()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        except BaseException:  # 包括提前关闭的生成器（GeneratorExit）
+            try:
+                conn.rollback()
+            except Exception:
+                conn.close()  # 连接已损坏，不再放回连接池
+                raise
+            self._release(conn)
+            raise
+        self._release(conn)
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        """关闭连接池中的所有连接"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _insert_row(self, cursor, params):
+        """插入一行 WordCloudData 并返回新行 ID"""
+        raise NotImplementedError
+
+    def _top_frequencies_sql(self):
+        """按词频从高到低取前 N 个词的查询，参数为 (N, TextID)"""
+        raise NotImplementedError
+
+    # 数据库操作方法
+    def add_to_database(self, image_path=None, text_path=None, frequencies=None, progress=None,
+                        frequency_settings=None):
+        """通用添加方法，可单独或同时添加图片和文本
+
+        提供 frequencies（词 -> 次数，或返回该 dict 的函数）时同时写入 WordFrequency 表，
+        之后可以直接用 get_top_frequencies 生成词云而不必重新分词。传入函数时
+        只在文本确实需要写入（不是重复内容）时才调用，避免为重复文本分词。
+        frequency_settings 为统计词频时停用词和分词设置的哈希，与词频一起保存，
+        读取时设置不同的词频不会被使用。
+        progress(已上传字节数, 总字节数) 在每写入一段内容后调用，
+        抛出 OperationCancelled 可以取消上传，整个添加操作回滚。
+        """
+        if image_path and not os.path.exists(image_path):
+            return False, f"图片文件不存在: {image_path}"
+        if text_path and not os.path.exists(text_path):
+            return False, f"文本文件不存在: {text_path}"
+
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                params = {}
+                duplicates = []
+                aliases = []  # 内容已存在但文件名不同：(已有行 ID, 类型, 新文件名)
+                streams = []  # 先插入元数据，再分段写入内容
+
+                # 先按内容哈希查重，已存在的内容不再上传
+                for kind, path, label in (('image', image_path, '图片'), ('text', text_path, '文本')):
+                    if not path:
+                        continue
+                    name_col, _, hash_col = self.LIST_COLUMNS[kind]
+                    digest = file_hash(path)
+                    existing = self._find_by_hash(cursor, hash_col, name_col, digest)
+                    if existing:
+                        existing_id, existing_name = existing
+                        name = os.path.basename(path)
+                        if name != existing_name:
+                            # 记为别名，之后按新文件名删除时能找到
+                            aliases.append((existing_id, kind, name))
+                            duplicates.append(f"{label}与已有的 {existing_name} 内容相同，已记为别名")
+                        else:
+                            duplicates.append(f"{label}已存在（{existing_name}）")
+                        continue
+                    params[name_col] = os.path.basename(path)
+                    params[hash_col] = digest
+                    codec = self._codec_for(kind, path)
+                    if codec:
+                        params[self.CODEC_COLUMNS[kind][0]] = codec
+                    streams.append((kind, path, codec))
+
+                for alias in aliases:
+                    self._insert_alias(cursor, *alias)
+                if not params:
+                    conn.commit()
+                    return True, f"{'，'.join(duplicates)}，未重复上传"
+
+                total = sum(os.path.getsize(path) for _, path, _ in streams)
+                sent = 0
+
+                def on_chunk(size):
+                    nonlocal sent
+                    sent += size
+                    if progress:
+                        progress(sent, total)
+
+                if 'TextHash' in params and callable(frequencies):
+                    frequencies = frequencies()
+                if 'TextHash' in params and frequencies and frequency_settings:
+                    params['FrequencySettings'] = frequency_settings
+                row_id = self._insert_row(cursor, params)
+                for kind, path, codec in streams:
+                    self._write_content(conn, cursor, row_id, kind, path, codec, on_chunk)
+                if 'TextHash' in params and frequencies:
+                    self._prepare_bulk_cursor(cursor)
+                    cursor.executemany(
+                        "INSERT INTO WordFrequency (TextID, Word, WordCount) VALUES (?, ?, ?)",
+                        [(row_id, w, cnt) for w, cnt in frequencies.items()
+                         if len(w) <= MAX_WORD_LEN])
+                conn.commit()
+
+            if duplicates:
+                return True, f"文件已成功添加到数据库（{'，'.join(duplicates)}，未重复上传）"
+            return True, "文件已成功添加到数据库"
+        except OperationCancelled:
+            return False, "已取消添加"
+        except Exception as e:
+            return False, f"添加失败: {str(e)}"
+
+    def _insert_alias(self, cursor, data_id, kind, name):
+        """把 name 记为已有行的别名，已记录过则忽略"""
+        alias = (data_id, kind, name)
+        cursor.execute(
+            "INSERT INTO WordCloudAlias (DataID, Kind, Name) SELECT ?, ?, ? "
+            "WHERE NOT EXISTS (SELECT * FROM WordCloudAlias "
+            "WHERE DataID=? AND Kind=? AND Name=?)", alias + alias)
+
+    def _codec_for(self, kind, path):
+        """决定某个文件是否压缩存储，返回压缩格式或 None"""
+        if not self.compression:
+            return None
+        if kind == 'image' and not path.lower().endswith(COMPRESSIBLE_IMAGE_EXTS):
+            return None
+        return self.compression
+
+    def _write_content(self, conn, cursor, row_id, kind, path, codec, on_chunk=None):
+        """写入文件内容；需要压缩时先流式压缩到临时文件，再分段写入压缩列
+
+        on_chunk(字节数) 按原文件读取的字节数调用；压缩后上传时只用来检查是否取消。
+        """
+        if not codec:
+            _, data_col, _ = self.LIST_COLUMNS[kind]
+            self._write_stream(conn, cursor, row_id, data_col, path, kind == 'text', on_chunk)
+            return
+        fd, tmp_path = tempfile.mkstemp(suffix=f'.{codec}')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                chunks = iter_file_chunks(path, False, on_chunk=on_chunk)
+                if kind == 'text':
+                    chunks = self._check_utf8(chunks)
+                for chunk in compress_chunks(chunks, codec):
+                    out.write(chunk)
+            self._write_stream(conn, cursor, row_id, self.CODEC_COLUMNS[kind][1], tmp_path, False,
+                               on_chunk and (lambda size: on_chunk(0)))
+        finally:
+            os.remove(tmp_path)
+
+    @staticmethod
+    def _check_utf8(chunks):
+        """原样产出 bytes 段，同时校验是否为合法 UTF-8"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for chunk in chunks:
+            decoder.decode(chunk)
+            yield chunk
+        decoder.decode(b'', final=True)
+
+    def _write_stream(self, conn, cursor, row_id, column, path, is_text, on_chunk=None):
+        """把文件内容分段写入某行的内容列，Python 中同时只持有一段
+
+        on_chunk(字节数) 在每读取一段后调用。
+        """
+        raise NotImplementedError
+
+    def _iter_column(self, conn, row_id, column, is_text, chunk_size):
+        """分段读取某行的内容列，文本产出 str，图片产出 bytes"""
+        raise NotImplementedError
+
+    def iter_blob(self, item_id, kind, chunk_size=BLOB_CHUNK_SIZE):
+        """流式读取图片（bytes 段）或文本（str 段）的内容，不在内存中拼出完整内容
+
+        压缩存储的内容边读边解压，chunk_size 是每次从数据库读取的压缩字节数。
+        """
+        _, data_col, _ = self.LIST_COLUMNS[kind]
+        codec_col, packed_col = self.CODEC_COLUMNS[kind]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {codec_col} FROM WordCloudData WHERE ID=?", (item_id,))
+            row = cursor.fetchone()
+            codec = row[0] if row else None
+            if not codec:
+                yield from self._iter_column(conn, item_id, data_col, kind == 'text', chunk_size)
+                return
+            chunks = decompress_chunks(
+                self._iter_column(conn, item_id, packed_col, False, chunk_size), codec)
+            yield from decode_chunks(chunks) if kind == 'text' else chunks
+
+    def _find_by_hash(self, cursor, hash_column, name_column, digest):
+        """按内容哈希查找已存储的 (ID, 文件名)，只读元数据"""
+        cursor.execute(f"SELECT ID, {name_column} FROM WordCloudData WHERE {hash_column}=?",
+                       (digest,))
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _existing_hashes(self, cursor, hash_column, digests):
+        """返回 digests 中已存在于数据库的哈希集合"""
+        if not digests:
+            return set()
+        marks = ', '.join(['?'] * len(digests))
+        cursor.execute(f"SELECT {hash_column} FROM WordCloudData WHERE {hash_column} IN ({marks})",
+                       tuple(digests))
+        return {row[0] for row in cursor.fetchall()}
+
+    def find_text_by_hash(self, digest):
+        """按内容哈希（file_hash）查找已存储的文本 ID，没有则返回 None"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT ID FROM WordCloudData WHERE TextHash=?", (digest,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def get_top_frequencies(self, text_id, limit=1000, settings=None):
+        """读取某个文本词频最高的 limit 个词（None 表示全部），返回按词频降序的 dict
+
+        提供 settings 时只在词频按相同的停用词和分词设置统计时返回，否则返回空 dict。
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            if settings is not None:
+                cursor.execute("SELECT FrequencySettings FROM WordCloudData WHERE ID=?", (text_id,))
+                row = cursor.fetchone()
+                if not row or row[0] != settings:
+                    return {}
+            if limit is None:
+                cursor.execute("SELECT Word, WordCount FROM WordFrequency "
+                               "WHERE TextID=? ORDER BY WordCount DESC", (text_id,))
+            else:
+                cursor.execute(self._top_frequencies_sql(), (limit, text_id))
+            return {word: count for word, count in cursor.fetchall()}
+
+    # 列表查询用到的列名，按类型区分
+    LIST_COLUMNS = {
+        'image': ('ImageName', 'ImageData', 'ImageHash'),
+        'text': ('TextFileName', 'TextData', 'TextHash'),
+    }
+    # 压缩格式列和压缩内容所在的列；图片压缩后仍存放在 ImageData，
+    # 文本压缩后是 bytes，不能放进 TextData，存放在 TextBlob
+    CODEC_COLUMNS = {
+        'image': ('ImageCodec', 'ImageData'),
+        'text': ('TextCodec', 'TextBlob'),
+    }
+
+    def _list_sql(self, name_col, data_col, packed_col, hash_col):
+        """只读元数据的分页查询，参数为 (条数, 起始 ID)"""
+        raise NotImplementedError
+
+    def list_items(self, kind, after_id=0, limit=100):
+        """按 ID 键集分页列出图片或文本的元数据，不读取内容
+
+        返回 dict 列表（id, name, size, hash, created），size 为存储的字节数
+        （压缩存储时为压缩后的大小）。下一页传入本页最后一项的 id 作为 after_id。
+        """
+        name_col, data_col, hash_col = self.LIST_COLUMNS[kind]
+        packed_col = self.CODEC_COLUMNS[kind][1]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._list_sql(name_col, data_col, packed_col, hash_col),
+                           (limit, after_id or 0))
+            return [{'id': row[0], 'name': row[1], 'size': row[2], 'hash': row[3],
+                     'created': row[4]} for row in cursor.fetchall()]
+
+    def fetch_blob(self, item_id, kind):
+        """按 ID 读取单个图片（bytes）或文本（str）的内容"""
+        _, data_col, _ = self.LIST_COLUMNS[kind]
+        codec_col, packed_col = self.CODEC_COLUMNS[kind]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {codec_col} FROM WordCloudData WHERE ID=?", (item_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            codec = row[0]
+            cursor.execute(f"SELECT {packed_col if codec else data_col} FROM WordCloudData WHERE ID=?",
+                           (item_id,))
+            data = cursor.fetchone()[0]
+        if codec and data is not None:
+            data = b''.join(decompress_chunks([data], codec))
+            if kind == 'text':
+                data = data.decode('utf-8')
+        return data
+
+    def _prepare_bulk_cursor(self, cursor):
+        """批量插入前对游标做数据库相关的设置"""
+
+    def import_directory(self, directory, batch_size=100, progress=None, recursive=True,
+                         batch_bytes=BATCH_BYTES):
+        """把目录中的图片和文本批量导入数据库
+
+        文件逐个读取，每攒够 batch_size 个或 batch_bytes 字节就用 executemany 在一个
+        事务中插入，内存中每种（类型, 压缩格式）最多只有一批文件。progress(已处理, 总数) 在每批提交后（以及大文件
+        的每一段写入后）调用，抛出 OperationCancelled 可以取消导入，已提交的批次保留。
+        读取失败的文件会被跳过并计入失败数；内容与已存储文件（或本次已导入
+        文件）相同的按哈希跳过，不上传内容，文件名不同时与 add_to_database 一样
+        记为别名。启用压缩时批次中的内容在内存中压缩。
+        """
+        if not os.path.isdir(directory):
+            return False, f"目录不存在: {directory}"
+
+        files = list(iter_import_files(directory, recursive))
+        total = len(files)
+        if not total:
+            return False, "目录中没有可导入的图片或文本文件"
+
+        def insert_sql(kind, codec):
+            name_col, data_col, hash_col = self.LIST_COLUMNS[kind]
+            if not codec:
+                return (f"INSERT INTO WordCloudData ({name_col}, {data_col}, {hash_col}) "
+                        f"VALUES (?, ?, ?)")
+            codec_col, packed_col = self.CODEC_COLUMNS[kind]
+            return (f"INSERT INTO WordCloudData ({name_col}, {packed_col}, {hash_col}, {codec_col}) "
+                    f"VALUES (?, ?, ?, ?)")
+
+        hash_columns = {'image': 'ImageHash', 'text': 'TextHash'}
+        batches = {}  # (类型, 压缩格式) -> 待插入的行
+        batch_sizes = {}  # (类型, 压缩格式) -> 待插入内容的字节数
+        seen = set()  # 本次导入中已出现的哈希
+        duplicates = []  # 跳过的 (类型, 哈希, 文件名)，原文件提交后记为别名
+        done = 0
+        skipped = 0
+        failed = 0
+        aliased = 0
+        start = time.perf_counter()
+
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                self._prepare_bulk_cursor(cursor)
+
+                def record_aliases():
+                    """为原文件已提交的重复文件记录别名，原文件还在批次中的留到之后"""
+                    nonlocal aliased
+                    queued = {row[2] for rows in batches.values() for row in rows}
+                    remaining = []
+                    for kind, digest, name in duplicates:
+                        if digest in queued:
+                            remaining.append((kind, digest, name))
+                            continue
+                        name_col, _, hash_col = self.LIST_COLUMNS[kind]
+                        existing = self._find_by_hash(cursor, hash_col, name_col, digest)
+                        if existing and existing[1] != name:
+                            self._insert_alias(cursor, existing[0], kind, name)
+                            aliased += 1
+                    if len(remaining) != len(duplicates):
+                        conn.commit()
+                    duplicates[:] = remaining
+
+                def flush(key):
+                    nonlocal done, skipped
+                    kind, codec = key
+                    rows = batches.pop(key, None)
+                    batch_sizes.pop(key, None)
+                    if rows:
+                        existing = self._existing_hashes(cursor, hash_columns[kind],
+                                                         [row[2] for row in rows])
+                        new_rows = [row for row in rows if row[2] not in existing]
+                        duplicates.extend((kind, row[2], row[0]) for row in rows
+                                          if row[2] in existing)
+                        if new_rows:
+                            cursor.executemany(insert_sql(kind, codec), new_rows)
+                            conn.commit()
+                        record_aliases()
+                        done += len(new_rows)
+                        skipped += len(rows) - len(new_rows)
+                        if progress:
+                            progress(done + skipped + failed, total)
+
+                for kind, path in files:
+                    try:
+                        if os.path.getsize(path) > STREAM_THRESHOLD:
+                            # 大文件不放进批次，单独流式写入
+                            digest = file_hash(path)
+                            if digest in seen or self._existing_hashes(
+                                    cursor, hash_columns[kind], [digest]):
+                                duplicates.append((kind, digest, os.path.basename(path)))
+                                skipped += 1
+                                continue
+                            name_col, _, hash_col = self.LIST_COLUMNS[kind]
+                            params = {name_col: os.path.basename(path), hash_col: digest}
+                            codec = self._codec_for(kind, path)
+                            if codec:
+                                params[self.CODEC_COLUMNS[kind][0]] = codec
+                            row_id = self._insert_row(cursor, params)
+                            self._write_content(
+                                conn, cursor, row_id, kind, path, codec,
+                                progress and (lambda size: progress(done + skipped + failed, total)))
+                            conn.commit()
+                            seen.add(digest)
+                            done += 1
+                            continue
+                        with open(path, 'rb') as f:
+                            raw = f.read()
+                        digest = content_hash(raw)
+                        if digest in seen:
+                            duplicates.append((kind, digest, os.path.basename(path)))
+                            skipped += 1
+                            continue
+                        data = raw if kind == 'image' else raw.decode('utf-8')
+                    except (OSError, UnicodeDecodeError) as e:
+                        conn.rollback()
+                        print(f"读取文件失败 {path}: {str(e)}")
+                        failed += 1
+                        continue
+                    seen.add(digest)
+                    codec = self._codec_for(kind, path)
+                    if codec:
+                        row = (os.path.basename(path), b''.join(compress_chunks([raw], codec)),
+                               digest, codec)
+                    else:
+                        row = (os.path.basename(path), data, digest)
+                    key = (kind, codec)
+                    batches.setdefault(key, []).append(row)
+                    batch_sizes[key] = batch_sizes.get(key, 0) + (len(row[1]) if codec else len(raw))
+                    if len(batches[key]) >= batch_size or batch_sizes[key] >= batch_bytes:
+                        flush(key)
+                for key in list(batches):
+                    flush(key)
+                record_aliases()
+        except OperationCancelled:
+            return False, f"已取消导入（已导入 {done} 个文件）"
+        except Exception as e:
+            return False, f"批量导入失败（已导入 {done} 个文件）: {str(e)}"
+
+        elapsed = time.perf_counter() - start
+        rate = done / elapsed if elapsed > 0 else float(done)
+        msg = f"已导入 {done} 个文件，重复跳过 {skipped} 个，失败 {failed} 个，用时 {elapsed:.2f}s（{rate:.1f} 个/秒）"
+        if aliased:
+            msg += f"，{aliased} 个重复文件以新文件名记为别名"
+        return True, msg
+
+    def delete_from_database(self, image_name=None, text_name=None):
+        """从数据库删除图片或文本
+
+        名称是别名时只删除别名，内容仍属于原文件名；删除原文件名时其别名一起删除。
+        """
+        if not (image_name or text_name):
+            return False, "必须提供图片名或文本名"
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                if image_name and text_name:
+                    cursor.execute("DELETE FROM WordCloudData WHERE ImageName=? AND TextFileName=?",
+                                   (image_name, text_name))
+                elif image_name:
+                    cursor.execute("DELETE FROM WordCloudData WHERE ImageName=?", (image_name,))
+                else:
+                    cursor.execute("DELETE FROM WordCloudData WHERE TextFileName=?", (text_name,))
+                deleted = cursor.rowcount
+                for kind, name in (('image', image_name), ('text', text_name)):
+                    if name:
+                        cursor.execute("DELETE FROM WordCloudAlias WHERE Kind=? AND Name=?",
+                                       (kind, name))
+                        deleted += cursor.rowcount
+                conn.commit()
+                return deleted > 0, "删除成功" if deleted else "数据库中没有该文件"
+        except Exception as e:
+            return False, f"数据库操作失败: {str(e)}"
+
+
+class SqlServerStore(WordCloudStore):
+    """SQL Server 存储（pyodbc）"""
+
+    def __init__(self, connection_string=None, pool_size=4, fast_executemany=True,
+                 compression=None):
+        super().__init__(pool_size, compression)
+        self.fast_executemany = fast_executemany
+        #需要填写自己的数据库连接信息
+        self.connection_string = connection_string or (
+            'DRIVER={ODBC Driver 17 for SQL Server};'
+            'SERVER=.;'
+            'DATABASE=WordCloudDB;'
+            'UID=sa;'
+            'PWD=PASSWORD;'
+            'Charset=UTF8;'
+        )
+
+    def _connect(self):
+        import pyodbc
+        return pyodbc.connect(self.connection_string)
+
+    def _prepare_bulk_cursor(self, cursor):
+        # 一次往返发送整批参数
+        cursor.fast_executemany = self.fast_executemany
+
+    def _insert_row(self, cursor, params):
+        columns = ', '.join(params.keys())
+        values = ', '.join(['?'] * len(params))
+        cursor.execute(f"INSERT INTO WordCloudData ({columns}) OUTPUT INSERTED.ID VALUES ({values})",
+                       tuple(params.values()))
+        return cursor.fetchone()[0]
+
+    def _write_stream(self, conn, cursor, row_id, column, path, is_text, on_chunk=None):
+        # .WRITE(段, NULL, NULL) 在列末尾追加，需要先置为空值而不是 NULL
+        cursor.execute(f"UPDATE WordCloudData SET {column}=? WHERE ID=?",
+                       ('' if is_text else b'', row_id))
+        for chunk in iter_file_chunks(path, is_text, on_chunk=on_chunk):
+            cursor.execute(f"UPDATE WordCloudData SET {column}.WRITE(?, NULL, NULL) WHERE ID=?",
+                           (chunk, row_id))
+
+    def _iter_column(self, conn, row_id, column, is_text, chunk_size):
+        # SUBSTRING 的位置从 1 开始，图片按字节；NVARCHAR 按 UTF-16 码元计数，
+        # 取回的 str 可能比 chunk_size 短，因此读到空段才结束。段尾恰好是代理对的
+        # 前半个时少取一个码元，避免把一个字符拆到两段里
+        cursor = conn.cursor()
+        if is_text:
+            sql = (f"SELECT SUBSTRING(d.{column}, ?, l.n), l.n FROM WordCloudData d "
+                   f"CROSS APPLY (SELECT CASE WHEN UNICODE(SUBSTRING(d.{column}, ?, 1)) "
+                   f"BETWEEN 55296 AND 56319 THEN ? ELSE ? END AS n) l WHERE d.ID=?")
+        else:
+            sql = f"SELECT SUBSTRING({column}, ?, ?) FROM WordCloudData WHERE ID=?"
+        offset = 1
+        while True:
+            if is_text:
+                cursor.execute(sql, (offset, offset + chunk_size - 1, chunk_size - 1, chunk_size,
+                                     row_id))
+            else:
+                cursor.execute(sql, (offset, chunk_size, row_id))
+            row = cursor.fetchone()
+            if not row or not row[0]:
+                break
+            yield row[0]
+            offset += row[1] if is_text else chunk_size
+
+    def _list_sql(self, name_col, data_col, packed_col, hash_col):
+        # DATALENGTH 只读取长度信息，不传输内容
+        return (f"SELECT TOP (?) ID, {name_col}, "
+                f"COALESCE(DATALENGTH({data_col}), DATALENGTH({packed_col})), {hash_col}, CreatedDate "
+                f"FROM WordCloudData WHERE {name_col} IS NOT NULL AND ID > ? ORDER BY ID")
+
+    def _top_frequencies_sql(self):
+        return ("SELECT TOP (?) Word, WordCount FROM WordFrequency "
+                "WHERE TextID=? ORDER BY WordCount DESC")
+
+    def _ensure_version_table(self, cursor):
+        cursor.execute("""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='SchemaVersion' AND xtype='U')
+        BEGIN
+            CREATE TABLE SchemaVersion (Version INT NOT NULL);
+            INSERT INTO SchemaVersion (Version) VALUES (0);
+        END
+        """)
+
+    MIGRATIONS = [
+        # 1: 基础表；由旧版建库脚本创建的表补上 CreatedDate
+        (1, [
+            """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='WordCloudData' AND xtype='U')
+            CREATE TABLE WordCloudData (
+                ID INT PRIMARY KEY IDENTITY(1,1),
+                ImageName NVARCHAR(255) NULL,
+                ImageData VARBINARY(MAX) NULL,
+                TextFileName NVARCHAR(255) NULL,
+                TextData NVARCHAR(MAX) NULL,
+                CreatedDate DATETIME DEFAULT GETDATE()
+            )
+            """,
+            """
+            IF COL_LENGTH('WordCloudData', 'CreatedDate') IS NULL
+            ALTER TABLE WordCloudData ADD CreatedDate DATETIME NULL
+                CONSTRAINT DF_WordCloudData_CreatedDate DEFAULT GETDATE()
+            """,
+        ]),
+        # 2: 内容哈希列及唯一索引，用于去重
+        (2, [
+            f"""
+            IF COL_LENGTH('WordCloudData', '{column}') IS NULL
+            ALTER TABLE WordCloudData ADD {column} CHAR(64) NULL
+            """ for column in ('ImageHash', 'TextHash')
+        ] + [
+            f"""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='UX_WordCloudData_{column}')
+            CREATE UNIQUE INDEX UX_WordCloudData_{column}
+                ON WordCloudData ({column}) WHERE {column} IS NOT NULL
+            """ for column in ('ImageHash', 'TextHash')
+        ]),
+        # 3: 预先统计的词频，随文本一起删除
+        (3, [
+            f"""
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='WordFrequency' AND xtype='U')
+            CREATE TABLE WordFrequency (
+                TextID INT NOT NULL REFERENCES WordCloudData(ID) ON DELETE CASCADE,
+                Word NVARCHAR(100) COLLATE {WORD_COLLATION} NOT NULL,
+                WordCount INT NOT NULL,
+                PRIMARY KEY (TextID, Word)
+            )
+            """,
+            """
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_WordFrequency_TextID_Count')
+            CREATE INDEX IX_WordFrequency_TextID_Count
+                ON WordFrequency (TextID, WordCount DESC) INCLUDE (Word)
+            """,
+        ]),
+        # 4: 按文件名查找和删除用的索引；MAX 类型的内容存放在行外，
+        #    聚集索引的数据行只保留元数据（已有内容在下次更新时移出）
+        (4, [
+            f"""
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_WordCloudData_{column}')
+            CREATE INDEX IX_WordCloudData_{column} ON WordCloudData ({column})
+            """ for column in ('ImageName', 'TextFileName')
+        ] + [
+            "EXEC sp_tableoption 'WordCloudData', 'large value types out of row', 1",
+        ]),
+        # 5: 压缩存储；Codec 为 NULL 表示未压缩，压缩后的文本存放在 TextBlob
+        (5, [
+            f"""
+            IF COL_LENGTH('WordCloudData', '{column}') IS NULL
+            ALTER TABLE WordCloudData ADD {column} {definition}
+            """ for column, definition in (('ImageCodec', 'VARCHAR(16) NULL'),
+                                           ('TextCodec', 'VARCHAR(16) NULL'),
+                                           ('TextBlob', 'VARBINARY(MAX) NULL'))
+        ]),
+        # 6: 词频按区分大小写和全半角的方式计数，Word 改为二进制排序规则，
+        #    否则默认排序规则下 "The" 和 "the" 主键冲突；主键和索引需要先删除再重建
+        (6, [
+            f"""
+            IF EXISTS (SELECT * FROM sys.columns WHERE object_id=OBJECT_ID('WordFrequency')
+                       AND name='Word' AND collation_name <> '{WORD_COLLATION}')
+            BEGIN
+                IF EXISTS (SELECT * FROM sys.indexes WHERE name='IX_WordFrequency_TextID_Count')
+                    DROP INDEX IX_WordFrequency_TextID_Count ON WordFrequency;
+                DECLARE @pk SYSNAME = (SELECT name FROM sys.key_constraints
+                                       WHERE parent_object_id=OBJECT_ID('WordFrequency') AND type='PK');
+                IF @pk IS NOT NULL
+                    EXEC('ALTER TABLE WordFrequency DROP CONSTRAINT ' + QUOTENAME(@pk));
+                ALTER TABLE WordFrequency ALTER COLUMN Word NVARCHAR(100) COLLATE {WORD_COLLATION} NOT NULL;
+            END
+            """,
+            """
+            IF NOT EXISTS (SELECT * FROM sys.key_constraints
+                           WHERE parent_object_id=OBJECT_ID('WordFrequency') AND type='PK')
+            ALTER TABLE WordFrequency ADD CONSTRAINT PK_WordFrequency PRIMARY KEY (TextID, Word)
+            """,
+            """
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_WordFrequency_TextID_Count')
+            CREATE INDEX IX_WordFrequency_TextID_Count
+                ON WordFrequency (TextID, WordCount DESC) INCLUDE (Word)
+            """,
+        ]),
+        # 7: 内容相同、以其他文件名添加的别名
+        (7, [
+            """
+            IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='WordCloudAlias' AND xtype='U')
+            CREATE TABLE WordCloudAlias (
+                DataID INT NOT NULL REFERENCES WordCloudData(ID) ON DELETE CASCADE,
+                Kind VARCHAR(8) NOT NULL,
+                Name NVARCHAR(255) NOT NULL
+            )
+            """,
+            """
+            IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_WordCloudAlias_Kind_Name')
+            CREATE INDEX IX_WordCloudAlias_Kind_Name ON WordCloudAlias (Kind, Name)
+            """,
+        ]),
+        # 8: 统计词频时停用词和分词设置的哈希，设置不同的词频不再使用；已有的词频为 NULL
+        (8, [
+            """
+            IF COL_LENGTH('WordCloudData', 'FrequencySettings') IS NULL
+            ALTER TABLE WordCloudData ADD FrequencySettings CHAR(40) NULL
+            """,
+        ]),
+    ]
+
+
+def _sqlite_add_column(table, column, definition):
+    """SQLite 没有 IF NOT EXISTS 形式的 ADD COLUMN，返回先检查再添加的迁移步骤"""
+    def step(cursor):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+
+class SQLiteStore(WordCloudStore):
+    """SQLite 存储，与 SQL Server 提供相同的操作，用于离线使用和测试"""
+
+    def __init__(self, path='./WordCloudDB.sqlite', pool_size=4, compression=None):
+        super().__init__(pool_size, compression)
+        self.path = path
+
+    def _connect(self):
+        # 连接会在线程池的不同线程间复用，同一时刻只有一个线程使用
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _ensure_version_table(self, cursor):
+        cursor.execute("CREATE TABLE IF NOT EXISTS SchemaVersion (Version INTEGER NOT NULL)")
+        cursor.execute("INSERT INTO SchemaVersion (Version) "
+                       "SELECT 0 WHERE NOT EXISTS (SELECT * FROM SchemaVersion)")
+
+    MIGRATIONS = [
+        # 1: 基础表
+        (1, [
+            """
+            CREATE TABLE IF NOT EXISTS WordCloudData (
+                ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                ImageName TEXT NULL,
+                ImageData BLOB NULL,
+                TextFileName TEXT NULL,
+                TextData TEXT NULL,
+                CreatedDate TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # ADD COLUMN 不允许 CURRENT_TIMESTAMP 默认值，补上的列不带默认值
+            _sqlite_add_column('WordCloudData', 'CreatedDate', 'TIMESTAMP NULL'),
+        ]),
+        # 2: 内容哈希列及唯一索引，用于去重
+        (2, [
+            _sqlite_add_column('WordCloudData', 'ImageHash', 'TEXT NULL'),
+            _sqlite_add_column('WordCloudData', 'TextHash', 'TEXT NULL'),
+        ] + [
+            f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS UX_WordCloudData_{column}
+                ON WordCloudData ({column}) WHERE {column} IS NOT NULL
+            """ for column in ('ImageHash', 'TextHash')
+        ]),
+        # 3: 预先统计的词频，随文本一起删除
+        (3, [
+            """
+            CREATE TABLE IF NOT EXISTS WordFrequency (
+                TextID INTEGER NOT NULL REFERENCES WordCloudData(ID) ON DELETE CASCADE,
+                Word TEXT NOT NULL,
+                WordCount INTEGER NOT NULL,
+                PRIMARY KEY (TextID, Word)
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS IX_WordFrequency_TextID_Count
+                ON WordFrequency (TextID, WordCount DESC)
+            """,
+        ]),
+        # 4: 按文件名查找和删除用的索引
+        (4, [
+            f"""
+            CREATE INDEX IF NOT EXISTS IX_WordCloudData_{column}
+                ON WordCloudData ({column}) WHERE {column} IS NOT NULL
+            """ for column in ('ImageName', 'TextFileName')
+        ]),
+        # 5: 压缩存储；Codec 为 NULL 表示未压缩，压缩后的文本存放在 TextBlob
+        (5, [
+            _sqlite_add_column('WordCloudData', 'ImageCodec', 'TEXT NULL'),
+            _sqlite_add_column('WordCloudData', 'TextCodec', 'TEXT NULL'),
+            _sqlite_add_column('WordCloudData', 'TextBlob', 'BLOB NULL'),
+        ]),
+        # 6: SQLite 的 TEXT 默认按二进制比较，词频表不需要修改，只保持版本号与 SQL Server 一致
+        (6, []),
+        # 7: 内容相同、以其他文件名添加的别名
+        (7, [
+            """
+            CREATE TABLE IF NOT EXISTS WordCloudAlias (
+                DataID INTEGER NOT NULL REFERENCES WordCloudData(ID) ON DELETE CASCADE,
+                Kind TEXT NOT NULL,
+                Name TEXT NOT NULL
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS IX_WordCloudAlias_Kind_Name ON WordCloudAlias (Kind, Name)
+            """,
+        ]),
+        # 8: 统计词频时停用词和分词设置的哈希
+        (8, [
+            _sqlite_add_column('WordCloudData', 'FrequencySettings', 'TEXT NULL'),
+        ]),
+    ]
+
+    def _insert_row(self, cursor, params):
+        columns = ', '.join(params.keys())
+        values = ', '.join(['?'] * len(params))
+        cursor.execute(f"INSERT INTO WordCloudData ({columns}) VALUES ({values})",
+                       tuple(params.values()))
+        return cursor.lastrowid
+
+    def _write_stream(self, conn, cursor, row_id, column, path, is_text, on_chunk=None):
+        if not hasattr(conn, 'blobopen'):  # Python 3.11 之前没有增量 BLOB 读写
+            chunks = iter_file_chunks(path, is_text, on_chunk=on_chunk)
+            data = ''.join(chunks) if is_text else b''.join(chunks)
+            cursor.execute(f"UPDATE WordCloudData SET {column}=? WHERE ID=?", (data, row_id))
+            return
+
+        # 先按字节数预留空间，再用增量 BLOB 写入原始字节
+        cursor.execute(f"UPDATE WordCloudData SET {column}=zeroblob(?) WHERE ID=?",
+                       (os.path.getsize(path), row_id))
+        chunks = iter_file_chunks(path, False, on_chunk=on_chunk)
+        if is_text:
+            chunks = self._check_utf8(chunks)  # 只校验编码，写入原始字节
+        with conn.blobopen('WordCloudData', column, row_id) as blob:
+            for chunk in chunks:
+                blob.write(chunk)
+        if is_text:
+            # 字节已是 UTF-8，转换存储类型后按文本读取
+            cursor.execute(f"UPDATE WordCloudData SET {column}=CAST({column} AS TEXT) WHERE ID=?",
+                           (row_id,))
+
+    def _iter_column(self, conn, row_id, column, is_text, chunk_size):
+        if not hasattr(conn, 'blobopen'):
+            row = conn.execute(f"SELECT {column} FROM WordCloudData WHERE ID=?", (row_id,)).fetchone()
+            if row and row[0]:
+                for i in range(0, len(row[0]), chunk_size):
+                    yield row[0][i:i + chunk_size]
+            return
+
+        try:
+            blob = conn.blobopen('WordCloudData', column, row_id, readonly=True)
+        except sqlite3.OperationalError:
+            return  # 行不存在或内容为 NULL
+        decoder = codecs.getincrementaldecoder('utf-8')() if is_text else None
+        with blob:
+            for chunk in iter(lambda: blob.read(chunk_size), b''):
+                yield decoder.decode(chunk) if decoder else chunk
+        if decoder:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+
+    def _list_sql(self, name_col, data_col, packed_col, hash_col):
+        return (f"SELECT ID, {name_col}, length(CAST(COALESCE({data_col}, {packed_col}) AS BLOB)), "
+                f"{hash_col}, CreatedDate "
+                f"FROM WordCloudData WHERE {name_col} IS NOT NULL AND ID > ?2 ORDER BY ID LIMIT ?1")
+
+    def _top_frequencies_sql(self):
+        return ("SELECT Word, WordCount FROM WordFrequency "
+                "WHERE TextID=?2 ORDER BY WordCount DESC LIMIT ?1")
+
+
+def create_store(backend=None):
+    """按名称创建存储，默认读取环境变量 WORDCLOUD_DB（sqlserver / sqlite）
+
+    WORDCLOUD_DB_COMPRESSION 设为 zlib 或 zstd 时压缩存储新写入的内容。
+    """
+    backend = (backend or os.environ.get('WORDCLOUD_DB', 'sqlserver')).lower()
+    compression = os.environ.get('WORDCLOUD_DB_COMPRESSION')
+    if backend == 'sqlite':
+        return SQLiteStore(os.environ.get('WORDCLOUD_SQLITE_PATH', './WordCloudDB.sqlite'),
+                           compression=compression)
+    if backend == 'sqlserver':
+        return SqlServerStore(os.environ.get('WORDCLOUD_DB_CONNECTION'), compression=compression)
+    raise ValueError(f"未知的数据库类型: {backend}")
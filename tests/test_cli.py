@@ -0,0 +1,36 @@
+#tests/test_cli.py
+import os
+import sys
+import json
+
+import pytest
+
+pytest.importorskip('jieba')
+pytest.importorskip('imageio')
+wordcloud = pytest.importorskip('wordcloud')
+from PIL import Image  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cli import load_manifest, run_job  # noqa: E402
+from freqfile import write_frequency_file  # noqa: E402
+
+
+def test_frequencies_only_job(tmp_path, monkeypatch):
+    """只提供 frequencies、不提供 text 的任务直接使用词频文件生成"""
+    monkeypatch.chdir(tmp_path)  # 缓存写在临时目录中
+    write_frequency_file('words.wfq', {'宋江': 30, '李逵': 20, 'word': 10})
+    Image.new('RGB', (200, 150), 'black').save('mask.png')
+    job = {
+        'frequencies': 'words.wfq',
+        'mask': 'mask.png',
+        'output': os.path.join('export', 'out.png'),
+        'font': os.path.join(os.path.dirname(wordcloud.__file__), 'DroidSansMono.ttf'),
+        'scale': 1,
+    }
+    (tmp_path / 'jobs.json').write_text(json.dumps({'jobs': [job]}), encoding='utf-8')
+    assert load_manifest('jobs.json') == [job]
+
+    result = run_job(0, job)
+    assert result['success'], result['message']
+    assert os.path.exists(job['output'])
@@ -0,0 +1,38 @@
+#tests/test_corpus.py
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('jieba')
+pytest.importorskip('imageio')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import CorpusIndex  # noqa: E402
+from storage import SQLiteStore  # noqa: E402
+
+SETTINGS = {'min_word_length': 2}
+
+
+def test_database_rows_without_hash(tmp_path):
+    """内容哈希列加入之前导入的行（TextHash 为 NULL）按 ID 各自建立索引"""
+    store = SQLiteStore(str(tmp_path / 'db.sqlite'))
+    with store.connection() as conn:
+        cursor = conn.cursor()
+        for name, text in [('a.txt', '宋江李逵吃酒'), ('b.txt', '悟空八戒取经')]:
+            cursor.execute("INSERT INTO WordCloudData (TextFileName, TextData) VALUES (?, ?)",
+                           (name, text))
+        conn.commit()
+
+    index = CorpusIndex(str(tmp_path / 'corpus'))
+    assert index.update_database(store, frozenset(), SETTINGS) == (2, 0)
+    assert len(index) == 2
+    assert index.contents == 2
+    digests = {doc['hash'] for doc in index.docs.values()}
+    assert len(digests) == 2 and None not in digests
+    for digest in digests:
+        assert os.path.exists(os.path.join(str(tmp_path / 'corpus'), 'docs', f'{digest}.wfq'))
+
+    # 没有变化时不再分词
+    assert index.update_database(store, frozenset(), SETTINGS) == (0, 0)
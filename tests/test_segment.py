@@ -0,0 +1,173 @@
+#tests/test_segment.py
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('jieba')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import segment  # noqa: E402
+from segment import (IncrementalCounter, align_chunks, count_token_stream,  # noqa: E402
+                     count_tokens, iter_text_chunks, normalize_chunks, normalize_text,
+                     universal_newline_chunks)
+
+
+def read_sample(chars=60000):
+    """取仓库自带小说的开头，包含章回标题和段落"""
+    with open(os.path.join(ROOT, 'texts', '水浒传.txt'), 'r', encoding='utf-8') as f:
+        return f.read(chars)
+
+
+def sample_text(chars=60000):
+    return normalize_text(read_sample(chars))
+
+
+def count_stream(chunks):
+    return count_token_stream(normalize_chunks(chunks))
+
+
+def test_parallel_count_matches_single_process(monkeypatch):
+    """多进程分词的计数和词的顺序（并列词频的先后）都与单进程相同"""
+    monkeypatch.setattr(segment, 'PARALLEL_MIN_CHARS', 0)  # 样本较短，也按多进程处理
+    text = sample_text()
+    assert len(segment.split_text(text, 16)) > 1
+
+    single = count_tokens(text, 1)
+    parallel = count_tokens(text, 4)
+    assert list(parallel.items()) == list(single.items())
+    assert parallel.most_common() == single.most_common()
+
+
+def test_streamed_file_matches_whole_text(tmp_path):
+    """分段读取文件（段比很多行还短）再对齐到换行，计数与整篇读取相同"""
+    text = read_sample(20000)
+    path = tmp_path / 'sample.txt'
+    path.write_text(text, encoding='utf-8')
+
+    whole = count_tokens(normalize_text(text))
+    chunks = list(iter_text_chunks(str(path), chunk_size=64))
+    assert len(chunks) > 10
+    streamed = count_stream(align_chunks(chunks))
+    assert list(streamed.items()) == list(whole.items())
+
+
+def test_arbitrary_chunks_realigned():
+    """在任意位置切开（包括词中间）的文本段经 align_chunks 后计数不变"""
+    text = read_sample(20000)
+    chunks = [text[i:i + 37] for i in range(0, len(text), 37)]
+    assert list(count_stream(align_chunks(chunks)).items()) == \
+        list(count_tokens(normalize_text(text)).items())
+
+
+def test_crlf_split_across_chunks():
+    """\\r\\n 被切在两段之间时仍只算一个换行，与文本模式读取一致"""
+    text = read_sample(5000).replace('\n', '\r\n')
+    expected = count_tokens(normalize_text(text.replace('\r\n', '\n')))
+    # 每个 \r 都是段尾，其后的 \n 在下一段开头；各段再按 size 切开
+    parts = text.replace('\r\n', '\r\0\n').split('\0')
+    for size in (3, 64, 100000):
+        chunks = [part[i:i + size] for part in parts for i in range(0, len(part), size)]
+        assert sum(chunk.endswith('\r') for chunk in chunks) == text.count('\r')
+        assert '\r' not in ''.join(universal_newline_chunks(chunks))
+        streamed = count_stream(align_chunks(universal_newline_chunks(chunks)))
+        assert list(streamed.items()) == list(expected.items())
+
+
+def whole_count(text):
+    return count_tokens(normalize_text(text))
+
+
+def append(path, data):
+    with open(path, 'ab') as f:
+        f.write(data.encode('utf-8') if isinstance(data, str) else data)
+
+
+def test_incremental_append(tmp_path):
+    """每次只读取追加的部分，累计结果与整篇重新统计相同"""
+    path = tmp_path / 'chat.txt'
+    path.write_bytes(b'')
+    counter = IncrementalCounter(str(path), chunk_size=16)
+    assert counter.update() == 0
+
+    text = ''
+    for line in ['宋江李逵在山上吃酒\n', '吴用和宋江商议下山\r\n', '李逵又要吃酒\n']:
+        append(path, line)
+        text += line
+        assert counter.update() == len(line.encode('utf-8'))
+        assert counter.counts() == whole_count(text.replace('\r\n', '\n'))
+    assert counter.update() == 0
+
+
+def test_incremental_partial_last_line(tmp_path):
+    """末尾没写完的一行计入 counts()，但不计入累计结果，写完后不会重复计数"""
+    path = tmp_path / 'chat.txt'
+    path.write_text('宋江李逵在山上吃酒\n武松', encoding='utf-8')
+    counter = IncrementalCounter(str(path))
+    counter.update()
+    assert counter.counts() == whole_count('宋江李逵在山上吃酒\n武松')
+    assert counter.counter == whole_count('宋江李逵在山上吃酒\n')
+
+    append(path, '打虎\n')
+    counter.update()
+    assert counter.counts() == whole_count('宋江李逵在山上吃酒\n武松打虎\n')
+
+
+def test_incremental_multibyte_split(tmp_path):
+    """多字节字符被读取块或写入切开时不会解码失败，也不会丢字"""
+    path = tmp_path / 'chat.txt'
+    text = '宋江李逵在山上吃酒\n武松打虎\n'
+    data = text.encode('utf-8')
+    # 读取块为 4 字节，汉字（3 字节）跨块
+    path.write_bytes(data)
+    counter = IncrementalCounter(str(path), chunk_size=4)
+    counter.update()
+    assert counter.counts() == whole_count(text)
+
+    # 追加的内容停在一个汉字中间
+    tail = '吴用下山\n'.encode('utf-8')
+    append(path, tail[:4])
+    counter.update()
+    counter.counts()  # 不完整的字符被忽略，不抛出异常
+    append(path, tail[4:])
+    counter.update()
+    assert counter.counts() == whole_count(text + '吴用下山\n')
+
+
+def test_incremental_truncate_and_rotate(tmp_path):
+    """文件变短或被替换（日志轮转）时从头统计"""
+    path = tmp_path / 'chat.txt'
+    path.write_text('宋江李逵在山上吃酒\n吴用和宋江商议下山\n', encoding='utf-8')
+    counter = IncrementalCounter(str(path))
+    counter.update()
+
+    path.write_text('武松打虎\n', encoding='utf-8')  # 原地截断后重写
+    counter.update()
+    assert counter.counts() == whole_count('武松打虎\n')
+
+    rotated = tmp_path / 'new.txt'
+    rotated.write_text('林冲夜奔\n鲁智深倒拔垂杨柳\n', encoding='utf-8')
+    os.replace(str(rotated), str(path))  # 新文件，大小比已读取的偏移更大
+    counter.update()
+    assert counter.counts() == whole_count('林冲夜奔\n鲁智深倒拔垂杨柳\n')
+
+
+def test_incremental_counts_returns_copy(tmp_path):
+    """counts() 返回副本，修改它或之后的 update() 都不影响已返回的结果"""
+    path = tmp_path / 'chat.txt'
+    path.write_text('宋江李逵\n', encoding='utf-8')
+    counter = IncrementalCounter(str(path))
+    counter.update()
+    counts = counter.counts()
+    assert counts is not counter.counter
+    snapshot = dict(counts)
+
+    counts['宋江'] += 100
+    assert counter.counts() == whole_count('宋江李逵\n')
+    append(path, '宋江吃酒\n')
+    counter.update()
+    assert dict(counts) != dict(counter.counts())
+    counts['宋江'] -= 100
+    assert dict(counts) == snapshot
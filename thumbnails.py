@@ -0,0 +1,112 @@
+#thumbnails.py
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPixmap
+
+from cache import ThumbnailCache
+from library import LibraryModel
+from storage import IMAGE_EXTS
+
+THUMBNAIL_SIZE = (180, 120)
+
+
+class ThumbnailLoader(QObject):
+    """在线程池中解码缩略图，结果通过信号回到界面线程"""
+    loaded = pyqtSignal(str, QImage)  # 名称, 缩略图
+    failed = pyqtSignal(str, str)     # 名称, 错误信息
+
+    def __init__(self, cache, threads=2, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(threads)
+
+    def request(self, name, path):
+        self._pool.start(ThumbnailLoadTask(self, name, path))
+
+    def clear(self):
+        """丢弃尚未开始的加载任务"""
+        self._pool.clear()
+
+
+class ThumbnailLoadTask(QRunnable):
+    def __init__(self, loader, name, path):
+        super().__init__()
+        self.loader = loader
+        self.name = name
+        self.path = path
+
+    def run(self):
+        # QImage 可以在非界面线程中使用，QPixmap 只能在界面线程中创建
+        try:
+            image = QImage(self.loader.cache.load(self.path))
+            if image.isNull():
+                raise ValueError("无法解码缩略图")
+        except Exception as e:
+            self.loader.failed.emit(self.name, str(e))
+            return
+        self.loader.loaded.emit(self.name, image)
+
+
+class ThumbnailModel(LibraryModel):
+    """缩略图列表模型
+
+    视图只会请求可见行的图标，图标在第一次被请求时才交给后台加载，加载完成前
+    显示空白占位图。内存中只保留最近用过的 memory_entries 个图标，
+    被淘汰的图标再次可见时从磁盘缓存重新读取。
+    """
+
+    def __init__(self, directory='./thumbnail', parent=None, cache=None, memory_entries=256,
+                 threads=2):
+        super().__init__(directory, IMAGE_EXTS, parent)
+        self.memory_entries = memory_entries
+        self._icons = OrderedDict()  # 名称 -> QPixmap
+        self._loading = set()
+        self._failed = set()
+        self._loader = ThumbnailLoader(cache or ThumbnailCache(size=THUMBNAIL_SIZE), threads, self)
+        self._loader.loaded.connect(self._on_loaded)
+        self._loader.failed.connect(self._on_failed)
+        self._placeholder = QPixmap(*THUMBNAIL_SIZE)
+        self._placeholder.fill(QColor('white'))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DecorationRole and index.isValid() and index.row() < self.rowCount():
+            return self._icon(index.data(Qt.DisplayRole))
+        return super().data(index, role)
+
+    def _icon(self, name):
+        if name in self._icons:
+            self._icons.move_to_end(name)
+            return self._icons[name]
+        if name not in self._loading and name not in self._failed:
+            self._loading.add(name)
+            self._loader.request(name, self.path(name))
+        return self._placeholder
+
+    def _on_loaded(self, name, image):
+        self._loading.discard(name)
+        row = self.find(name)
+        if row < 0:
+            return  # 加载期间已被删除
+        self._icons[name] = QPixmap.fromImage(image)
+        while len(self._icons) > self.memory_entries:
+            self._icons.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def _on_failed(self, name, message):
+        self._loading.discard(name)
+        self._failed.add(name)
+        print(f"加载缩略图失败 {name}: {message}")
+
+    def load(self):
+        self._loader.clear()
+        self._icons.clear()
+        self._loading.clear()
+        self._failed.clear()
+        super().load()
+
+    def item_removed(self, name):
+        self._icons.pop(name, None)
+        self._failed.discard(name)
@@ -1,7 +1,7 @@
 #ui.py
 import os
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QScrollArea, QLabel, QComboBox, QListWidget,
+                             QListView, QLabel, QComboBox, QCheckBox,
                              QLineEdit, QGridLayout, QSizePolicy, QSlider)
 from PyQt5.QtCore import Qt, QSize
 from PyQt5.QtGui import QIcon
@@ -47,12 +47,13 @@ class WordCloudUI:
         top_buttons.addWidget(self.btn_select_font)
         left_layout.addLayout(top_buttons)
 
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_content = QWidget()
-        self.thumbnail_layout = QVBoxLayout(scroll_content)
-        scroll_area.setWidget(scroll_content)
-        left_layout.addWidget(scroll_area)
+        # 缩略图列表只为可见行绘制图标，条目数量多时启动和滚动开销不变
+        self.thumbnail_view = QListView()
+        self.thumbnail_view.setIconSize(QSize(180, 120))
+        self.thumbnail_view.setUniformItemSizes(True)
+        self.thumbnail_view.setSpacing(2)
+        self.thumbnail_view.setStyleSheet("background-color: white;")
+        left_layout.addWidget(self.thumbnail_view)
 
         main_layout.addWidget(left_widget, 3)
 
@@ -70,9 +71,11 @@ class WordCloudUI:
         self.btn_update = QPushButton('更新词云图')
         self.btn_export = QPushButton('导出到同目录下文件夹')
         self.btn_save_as = QPushButton('另存为')
+        self.btn_export_freq = QPushButton('导出词频')
         btn_layout.addWidget(self.btn_update)
         btn_layout.addWidget(self.btn_export)
         btn_layout.addWidget(self.btn_save_as)
+        btn_layout.addWidget(self.btn_export_freq)
 
         center_layout.addWidget(self.wordcloud_label)
         center_layout.addLayout(btn_layout)
@@ -161,7 +164,31 @@ class WordCloudUI:
         font_layout.addWidget(scale_widget)
 
         # 文本列表区域
-        self.text_list = QListWidget()
+        self.text_list = QListView()
+        self.text_list.setUniformItemSizes(True)
+        self.chk_watch_text = QCheckBox('跟踪文本追加并自动更新')
+        self.chk_trace_memory = QCheckBox('统计峰值内存（生成会变慢）')
+
+        # 词权重区域
+        weighting_widget = QWidget()
+        weighting_layout = QHBoxLayout(weighting_widget)
+        weighting_layout.addWidget(QLabel("词权重:"))
+        self.weighting_combo = QComboBox()
+        self.weighting_combo.addItem('词频', 'count')
+        self.weighting_combo.addItem('TF-IDF（对比语料库）', 'tfidf')
+        weighting_layout.addWidget(self.weighting_combo)
+        self.btn_update_corpus = QPushButton('更新语料索引')
+        weighting_layout.addWidget(self.btn_update_corpus)
+
+        # 分词进程数区域
+        workers_widget = QWidget()
+        workers_layout = QHBoxLayout(workers_widget)
+        workers_layout.addWidget(QLabel("分词进程:"))
+        self.workers_combo = QComboBox()
+        self.workers_combo.addItem('自动（全部核心）', 0)
+        for count in (1, 2, 4, 8, 16):
+            self.workers_combo.addItem(str(count), count)
+        workers_layout.addWidget(self.workers_combo)
 
         # 数据库操作按钮区域
         db_btn_widget = QWidget()
@@ -169,15 +196,24 @@ class WordCloudUI:
 
         self.btn_add_text = QPushButton('添加文本到数据库')
         self.btn_add_image = QPushButton('添加图片到数据库')
+        self.btn_import_dir = QPushButton('导入文件夹到数据库')
+        self.btn_cancel_db = QPushButton('取消数据库操作')
+        self.btn_cancel_db.setEnabled(False)
         # self.btn_add_both = QPushButton('同时添加图片和文本')
 
         db_btn_layout.addWidget(self.btn_add_text)
         db_btn_layout.addWidget(self.btn_add_image)
+        db_btn_layout.addWidget(self.btn_import_dir)
+        db_btn_layout.addWidget(self.btn_cancel_db)
         # db_btn_layout.addWidget(self.btn_add_both)
 
         # 将各部分添加到右侧主布局
         self.right_layout.addWidget(font_widget)
         self.right_layout.addWidget(self.text_list)
+        self.right_layout.addWidget(self.chk_watch_text)
+        self.right_layout.addWidget(weighting_widget)
+        self.right_layout.addWidget(workers_widget)
+        self.right_layout.addWidget(self.chk_trace_memory)
         self.right_layout.addWidget(db_btn_widget)
 
         main_layout.addWidget(right_widget, 2)
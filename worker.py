@@ -0,0 +1,198 @@
+#worker.py
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThread, QThreadPool, QTimer, pyqtSignal
+
+from storage import OperationCancelled
+
+
+class GenerateThread(QThread):
+    """在后台线程中生成词云"""
+    draft = pyqtSignal(object)  # 草图图像
+    done = pyqtSignal(object, bool, str)  # 任务, 是否成功, 消息
+
+    def __init__(self, job, parent=None):
+        super().__init__(parent)
+        self.job = job
+
+    def run(self):
+        success, message = self.job.generate_wordcloud(
+            on_draft=self.draft.emit)
+        self.done.emit(self.job, success, message)
+
+
+class WordCloudGenerator(QObject):
+    """后台生成调度：合并短时间内的多次请求，只渲染最新参数，丢弃过期结果"""
+    drafted = pyqtSignal(object)  # 草图图像
+    finished = pyqtSignal(object, bool, str)  # 任务, 是否成功, 消息
+
+    def __init__(self, parent=None, delay=150):
+        super().__init__(parent)
+        self._pending = None       # 等待执行的最新任务
+        self._thread = None        # 正在执行的线程
+        self._running_key = None   # 正在执行的任务参数
+        self._shown_key = None     # 当前显示的图片对应的参数，显示草图时为 None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._start_pending)
+
+    def request(self, job):
+        """提交生成任务，job 为 WordCloudCore.snapshot() 得到的参数快照"""
+        key = job.params_key()
+        if key == self._running_key:
+            # 正在生成的就是这组参数，之前排队的请求已过期
+            self._pending = None
+            return
+        if self._thread is None and key == self._shown_key:
+            # 又回到了当前显示的参数，排队中的请求作废
+            self._pending = None
+            self._timer.stop()
+            return
+        self._pending = job
+        self._timer.start()
+
+    def is_busy(self):
+        return self._thread is not None or self._pending is not None
+
+    def shutdown(self, msecs=-1):
+        """丢弃排队的请求并等待正在生成的线程结束（生成过程无法中途打断）"""
+        self._timer.stop()
+        self._pending = None
+        if self._thread is not None:
+            return self._thread.wait(msecs)
+        return True
+
+    def mark_rendered(self, key):
+        """界面线程直接更新了图片（如仅改颜色）时同步记录"""
+        self._shown_key = key
+
+    def _start_pending(self):
+        if self._thread is not None or self._pending is None:
+            return  # 当前任务结束后再开始
+        job = self._pending
+        self._pending = None
+        self._running_key = job.params_key()
+
+        thread = GenerateThread(job, self)
+        thread.draft.connect(self._on_draft)
+        thread.done.connect(self._on_done)
+        thread.finished.connect(thread.deleteLater)
+        self._thread = thread
+        thread.start()
+
+    def _on_draft(self, image):
+        if self._pending is None:  # 已有更新的请求时草图也已过期
+            self._shown_key = None
+            self.drafted.emit(image)
+
+    def _on_done(self, job, success, message):
+        key = self._running_key
+        self._thread = None
+        self._running_key = None
+
+        if self._pending is not None:
+            pending_key = self._pending.params_key()
+            if pending_key != key:
+                if pending_key == self._shown_key:
+                    # 期间又改回了正在显示的参数，这次的结果和排队的请求都不需要
+                    self._pending = None
+                    self._timer.stop()
+                    return
+                # 期间参数又变了，丢弃这次的结果，直接生成最新的
+                self._start_pending()
+                return
+            self._pending = None
+        if success:
+            self._shown_key = key  # 只记录真正显示出来的结果
+        self.finished.emit(job, success, message)
+
+
+class DatabaseTaskSignals(QObject):
+    progress = pyqtSignal('qint64', 'qint64')  # 已完成, 总数（字节数可能超过 int 范围）
+    done = pyqtSignal(bool, str)               # 是否成功, 消息
+
+
+class DatabaseTask(QRunnable):
+    """在线程池中执行一次数据库操作
+
+    func(report) 返回 (是否成功, 消息)，需要报告进度的操作把 report 作为
+    progress 回调传给存储层；cancel() 之后下一次 report 会抛出 OperationCancelled。
+    """
+
+    def __init__(self, label, func):
+        super().__init__()
+        self.setAutoDelete(False)  # 由 DatabaseWorker 持有，完成后释放
+        self.label = label
+        self.signals = DatabaseTaskSignals()
+        self._func = func
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def report(self, done, total):
+        if self._cancelled.is_set():
+            raise OperationCancelled()
+        self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            success, message = self._func(self.report)
+        except OperationCancelled:
+            success, message = False, "操作已取消"
+        except Exception as e:
+            success, message = False, f"数据库操作失败: {str(e)}"
+        self.signals.done.emit(success, message)
+
+
+class DatabaseWorker(QObject):
+    """数据库后台任务调度：多个任务在线程池中并发执行，各自从连接池取连接"""
+    progress = pyqtSignal(object, 'qint64', 'qint64')  # 任务, 已完成, 总数
+    finished = pyqtSignal(object, bool, str)            # 任务, 是否成功, 消息
+    busy_changed = pyqtSignal(bool)                     # 是否有未完成的任务
+
+    def __init__(self, max_threads=4, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._tasks = []
+
+    def submit(self, label, func, on_done=None):
+        """提交任务，on_done(是否成功, 消息) 在界面线程中调用"""
+        task = DatabaseTask(label, func)
+        task.signals.progress.connect(lambda done, total: self.progress.emit(task, done, total))
+        task.signals.done.connect(lambda success, message: self._on_done(task, success, message))
+        if on_done:
+            task.signals.done.connect(on_done)
+        self._tasks.append(task)
+        if len(self._tasks) == 1:
+            self.busy_changed.emit(True)
+        self._pool.start(task)
+        return task
+
+    def is_busy(self):
+        return bool(self._tasks)
+
+    def cancel_all(self):
+        """取消所有未完成的任务，尚未开始的任务直接移出队列"""
+        for task in list(self._tasks):
+            task.cancel()
+            if self._pool.tryTake(task):
+                task.signals.done.emit(False, "操作已取消")
+
+    def wait(self, msecs=-1):
+        """等待正在执行的任务结束"""
+        return self._pool.waitForDone(msecs)
+
+    def _on_done(self, task, success, message):
+        if task not in self._tasks:
+            return
+        self._tasks.remove(task)
+        self.finished.emit(task, success, message)
+        if not self._tasks:
+            self.busy_changed.emit(False)
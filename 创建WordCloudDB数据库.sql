@@ -6,11 +6,60 @@ GO
 USE WordCloudDB;
 GO
 
+-- еǨƣstorage.py  SqlServerStore.MIGRATIONSһ£ǰ汾Ϊ 8
+-- ݿִбűʱԶ
+
 -- Ϊ WordCloudData ı
 CREATE TABLE WordCloudData (
     ID INT IDENTITY(1,1) PRIMARY KEY,
     ImageName NVARCHAR(255),
     ImageData VARBINARY(MAX),
     TextFileName NVARCHAR(255),
-    TextData NVARCHAR(MAX)
-);
\ No newline at end of file
+    TextData NVARCHAR(MAX),
+    CreatedDate DATETIME NULL CONSTRAINT DF_WordCloudData_CreatedDate DEFAULT GETDATE(),
+    ImageHash CHAR(64) NULL,
+    TextHash CHAR(64) NULL,
+    -- ѹʽzlib / zstdNULL ʾδѹѹı TextBlob
+    ImageCodec VARCHAR(16) NULL,
+    TextCodec VARCHAR(16) NULL,
+    TextBlob VARBINARY(MAX) NULL,
+    -- ͳ WordFrequency ʱͣôʺͷִõĹϣòͬʱʹԤͳƵĴƵ
+    FrequencySettings CHAR(40) NULL
+);
+GO
+
+-- ݹϣΨһȥ
+CREATE UNIQUE INDEX UX_WordCloudData_ImageHash ON WordCloudData (ImageHash) WHERE ImageHash IS NOT NULL;
+CREATE UNIQUE INDEX UX_WordCloudData_TextHash ON WordCloudData (TextHash) WHERE TextHash IS NOT NULL;
+
+-- ļҺɾõ
+CREATE INDEX IX_WordCloudData_ImageName ON WordCloudData (ImageName);
+CREATE INDEX IX_WordCloudData_TextFileName ON WordCloudData (TextFileName);
+
+-- ͼƬıݴ
+EXEC sp_tableoption 'WordCloudData', 'large value types out of row', 1;
+GO
+
+-- ԤͳƵĴƵ
+CREATE TABLE WordFrequency (
+    TextID INT NOT NULL REFERENCES WordCloudData(ID) ON DELETE CASCADE,
+    Word NVARCHAR(100) COLLATE Latin1_General_100_BIN2 NOT NULL,  -- ִСдȫ
+    WordCount INT NOT NULL,
+    PRIMARY KEY (TextID, Word)
+);
+CREATE INDEX IX_WordFrequency_TextID_Count ON WordFrequency (TextID, WordCount DESC) INCLUDE (Word);
+GO
+
+-- ļͬļӵıһɾ
+CREATE TABLE WordCloudAlias (
+    DataID INT NOT NULL REFERENCES WordCloudData(ID) ON DELETE CASCADE,
+    Kind VARCHAR(8) NOT NULL,  -- image / text
+    Name NVARCHAR(255) NOT NULL
+);
+CREATE INDEX IX_WordCloudAlias_Kind_Name ON WordCloudAlias (Kind, Name);
+GO
+
+-- ݿṹ汾
+CREATE TABLE SchemaVersion (Version INT NOT NULL);
+INSERT INTO SchemaVersion (Version) VALUES (8);
+GO